@@ -0,0 +1,258 @@
+"""
+Benchmarks for the page parsers and the crawl pipelines
+
+Parsers are run over synthetic pages of increasing size. Backloggery.find
+and HowLongToBeat.find are run end to end against a local stub server with
+a configurable latency. The results are written as json, eg:
+
+    python benchmarks/bench.py --latency 0.05 --output bench_output.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import timeit
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_site_tools import backloggery, howlongtobeat, titles  # noqa: E402
+from game_site_tools.session import make_session  # noqa: E402
+from game_site_tools.throttle import HostThrottle, ThrottleSettings  # noqa: E402
+
+STATUSES = ["(u)", "(U)", "(B)", "(C)", "(M)", "(-)"]
+
+GAMEBOX = """
+<section class="gamebox">
+    <h2>
+        <a href="games.php?user=bench&amp;console=PC&amp;status=2">
+            <img alt="{status}" width="16" height="16" src="images/status.gif" />
+        </a>
+        <b>Game {index}</b>
+    </h2>
+    <div class="gamerow"><b>{platform}</b></div>
+    <div class="gamerow">Some notes about game {index}</div>
+</section>
+"""
+
+HLTB_HIT = """
+<li class="back_darkish">
+    <div class="search_list_details">
+        <h3 class="shadow_text">
+            <a class="text_white" title="{title}" href="game?id={index}">{title}</a>
+        </h3>
+        <div class="search_list_details_block"><div>
+            <div class="search_list_tidbit text_white shadow_text">Main Story</div>
+            <div class="search_list_tidbit center time_100">{hours} Hours </div>
+            <div class="search_list_tidbit text_white shadow_text">Main + Extra</div>
+            <div class="search_list_tidbit center time_100">{hours}&#189; Hours </div>
+            <div class="search_list_tidbit text_white shadow_text">Completionist</div>
+            <div class="search_list_tidbit center time_100">--</div>
+        </div></div>
+    </div>
+</li>
+"""
+
+HLTB_NO_HITS = "<div class='search_loading'>No results in <u>games</u>, sorry mate.</div>"
+
+
+def backloggery_page(start, count):
+    return "".join(GAMEBOX.format(status=STATUSES[i % len(STATUSES)],
+                                  index=i,
+                                  platform=["PC", "PS2", "3DS"][i % 3])
+                   for i in range(start, start + count))
+
+
+def hltb_page(title, count):
+    return "<ul>" + "".join(HLTB_HIT.format(title=title if i == 0 else "{} {}".format(title, i),
+                                            index=i,
+                                            hours=i % 90 + 1)
+                            for i in range(count)) + "</ul>"
+
+
+def measure(fn, repeat):
+    seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak_memory_bytes": peak}
+
+
+def bench_parsers(sizes, repeat):
+    results = []
+    for size in sizes:
+        page = backloggery_page(0, size).encode("utf-8")
+        for backend in ["lxml", "html.parser"]:
+            if backend == "lxml" and backloggery.html is None:
+                continue
+            parser = backloggery.GamePageParser(backend)
+            result = measure(lambda: parser.parse_page(page), repeat)
+            result.update({"name": "backloggery.parse_page", "backend": backend, "games": size})
+            results.append(result)
+        page = hltb_page("Game", size).encode("utf-8")
+        parser = howlongtobeat.GamePageParser()
+        for method in ["get_story_hours", "get_entries"]:
+            result = measure(lambda: getattr(parser, method)(page), repeat)
+            result.update({"name": "howlongtobeat." + method, "games": size})
+            results.append(result)
+    return results
+
+
+def title_corpus(count):
+    series = ["Kings Quest", "Final Fantasy", "The Legend of Zelda: Ocarina of Time",
+              "Pokémon Red", "Baldur's Gate", "Anno 1701 A.D"]
+    return ["{} {}: Episode {}".format(series[i % len(series)],
+                                      i % 40 if i % 2 else titles.to_roman(i % 39 + 1), i)
+            for i in range(count)]
+
+
+def bench_titles(count):
+    corpus = title_corpus(count)
+    results = []
+    for name in ["normalize", "number_variants"]:
+        fn = getattr(titles, name)
+        for cache in ["cold", "warm"]:
+            if cache == "cold":
+                fn.cache_clear()
+            start = time.perf_counter()
+            for title in corpus:
+                fn(title)
+            results.append({"name": "titles." + name, "cache": cache, "titles": count,
+                            "seconds": time.perf_counter() - start})
+    return results
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency, library_size, page_size):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.library_size = library_size
+        self.page_size = page_size
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:{}".format(self.server_address[1])
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _reply(self, body):
+        time.sleep(self.server.latency)
+        self.server.count_request()
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        start = int(query["ajid"][0])
+        count = max(0, min(self.server.page_size, self.server.library_size - start))
+        self._reply(backloggery_page(start, count))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        query = parse_qs(self.rfile.read(length).decode("utf-8"))["queryString"][0]
+        # Titles ending in a number are only known by their roman numeral
+        if query[-1].isdigit():
+            self._reply(HLTB_NO_HITS)
+        else:
+            self._reply(hltb_page(query, 5))
+
+    def log_message(self, *args):
+        pass
+
+
+def stub_throttle():
+    return HostThrottle(ThrottleSettings(rate=10000, burst=10000, max_rate=10000))
+
+
+def bench_backloggery_find(server, workers):
+    api = backloggery.SiteApi("bench", session=make_session(pool_size=workers), throttle=stub_throttle())
+    api.url = server.base_url + "/ajax_moregames.php"
+    b = backloggery.Backloggery("bench")
+    b.api = api
+    server.requests = 0
+    start = time.perf_counter()
+    games = b.find(workers=workers)
+    return {"name": "Backloggery.find",
+            "workers": workers,
+            "games": len(games),
+            "seconds": time.perf_counter() - start,
+            "requests": server.requests}
+
+
+def bench_hltb_find(server, lookups, workers):
+    api = howlongtobeat.SiteApi(session=make_session(pool_size=workers), throttle=stub_throttle())
+    api.url = server.base_url + "/search_results"
+    h = howlongtobeat.HowLongToBeat()
+    h.api = api
+    titles = ["Game {}".format(i) for i in range(1, lookups + 1)]
+    server.requests = 0
+    start = time.perf_counter()
+    h.find_many(titles, workers=workers)
+    return {"name": "HowLongToBeat.find_many",
+            "workers": workers,
+            "lookups": lookups,
+            "seconds": time.perf_counter() - start,
+            "requests": server.requests,
+            "requests_per_lookup": server.requests / lookups}
+
+
+def bench_crawls(latency, library_size, lookups, workers):
+    server = StubServer(latency, library_size, backloggery.Backloggery.NUM_PAGE_RESULTS)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        results = []
+        for worker_count in sorted({1, workers}):
+            results.append(bench_backloggery_find(server, worker_count))
+            results.append(bench_hltb_find(server, lookups, worker_count))
+        return results
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub server latency in seconds")
+    parser.add_argument("--library-size", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--titles", type=int, default=100000, help="size of the title corpus")
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "python": sys.version.split()[0],
+        "parsers": bench_parsers(args.sizes, args.repeat),
+        "titles": bench_titles(args.titles),
+        "crawls": bench_crawls(args.latency, args.library_size, args.lookups, args.workers),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
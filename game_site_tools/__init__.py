@@ -1,2 +1,2 @@
-from .backloggery import Backloggery, GameStatus, Game
+from .backloggery import Backloggery, GameStatus, Game, GameTable
 from .howlongtobeat import HowLongToBeat
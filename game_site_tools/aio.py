@@ -0,0 +1,140 @@
+"""
+asyncio versions of the Backloggery and HowLongToBeat APIs
+
+Requires the optional aiohttp dependency: pip install game_site_tools[async]
+"""
+import asyncio
+
+import aiohttp
+
+from . import backloggery, howlongtobeat
+from .errors import SiteError
+from .howlongtobeat import LookupResult
+from .titles import number_variants
+
+
+class AsyncSiteClient:
+    """
+    Does the HTTP requests for the async APIs
+
+    One client can be shared by any number of AsyncBackloggery and
+    AsyncHowLongToBeat objects. At most `max_concurrency` requests are in
+    flight at once across all of them.
+    """
+    def __init__(self, session=None, max_concurrency=20):
+        self.session = session
+        self.max_concurrency = max_concurrency
+        self.semaphore = None
+
+    async def _ensure_open(self):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self.session is None:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+
+    async def _read(self, response):
+        """
+        Returns the body of a successful response, otherwise raises SiteError
+
+        An error page must not be parsed, as it would look like no results
+        """
+        if response.status == 429:
+            raise SiteError("Too many requests", 429)
+        if response.status >= 400:
+            raise SiteError("HTTP error {}".format(response.status), response.status)
+        return await response.read()
+
+    async def get(self, url, params):
+        await self._ensure_open()
+        async with self.semaphore:
+            async with self.session.get(url, params=params) as response:
+                return await self._read(response)
+
+    async def post(self, url, headers, data, params):
+        await self._ensure_open()
+        async with self.semaphore:
+            async with self.session.post(url, headers=headers, data=data, params=params) as response:
+                return await self._read(response)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        await self._ensure_open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncBackloggery:
+    NUM_PAGE_RESULTS = backloggery.Backloggery.NUM_PAGE_RESULTS
+
+    parser = backloggery.GamePageParser()
+
+    def __init__(self, username, client):
+        self.username = username
+        self.client = client
+
+    async def _find_page(self, params):
+        params = backloggery.SiteApi.search_params(self.username, params)
+        page = await self.client.get(backloggery.SiteApi.url, params)
+        return self.parser.parse_page(page)
+
+    def _page_params(self, extra_params, offset):
+        params = dict(extra_params)
+        params["ajid"] = offset
+        return params
+
+    async def find(self, extra_params={}, workers=1):
+        """
+        Fetches `workers` pages at a time
+
+        The page size is taken from the first page, as in Backloggery.iter_pages.
+        The result is the same as Backloggery.find
+        """
+        games = await self._find_page(self._page_params(extra_params, 0))
+        page_size = len(games)
+        if page_size < self.NUM_PAGE_RESULTS:
+            return games
+        count = page_size
+        while True:
+            offsets = [count + i * page_size for i in range(workers)]
+            pages = await asyncio.gather(
+                *[self._find_page(self._page_params(extra_params, offset)) for offset in offsets])
+            for games_page in pages:
+                games += games_page
+                count += len(games_page)
+                if len(games_page) != page_size:
+                    return games
+
+
+class AsyncHowLongToBeat:
+    api = howlongtobeat.SiteApi()
+    parser = howlongtobeat.GamePageParser()
+
+    def __init__(self, client):
+        self.client = client
+
+    async def _find_game(self, game_name):
+        page = await self.client.post(self.api.url, self.api.headers,
+                                      self.api.build_data(game_name), self.api.params)
+        return self.parser.get_story_hours(page)
+
+    async def find(self, game_name):
+        time = await self._find_game(game_name)
+        for new_name in number_variants(game_name):
+            if time is not None:
+                break
+            time = await self._find_game(new_name)
+        return time
+
+    async def _lookup(self, game_name):
+        try:
+            return LookupResult(game_name, await self.find(game_name), None)
+        except Exception as e:
+            return LookupResult(game_name, None, e)
+
+    async def find_many(self, game_names):
+        return await asyncio.gather(*[self._lookup(game_name) for game_name in game_names])
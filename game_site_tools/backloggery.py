@@ -1,7 +1,25 @@
+import re
+import sys
+import time
+import weakref
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from itertools import product
+from urllib.parse import urlparse
 
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, UnicodeDammit
+
+try:
+    from lxml import etree, html
+except ImportError:
+    html = None
+
+from .cache import make_key
+from .coalesce import SingleFlight
+from .metrics import metrics
+from .session import default_session
+from .throttle import host_throttle
 
 class GameStatus(Enum):
     unplayed = "(u)"
@@ -11,8 +29,57 @@ class GameStatus(Enum):
     mastered = "(M)"
     null = "(-)"
 
+
+def _tag_string(element):
+    """
+    Returns the same value as BeautifulSoup's Tag.string for an lxml element
+    """
+    if len(element) == 0:
+        return element.text
+    if len(element) == 1 and not element.text and not element[0].tail:
+        return _tag_string(element[0])
+    return None
+
+
 class GamePageParser:
-    def parse_page(self, page_text):
+    """
+    Parses a page of games
+
+    Uses lxml directly when it is installed, as it is several times faster
+    than building a BeautifulSoup tree. Otherwise, or when called with
+    backend="html.parser", BeautifulSoup with html.parser is used. Both
+    backends return the same games.
+    """
+    total_pattern = re.compile(r"\btotal=(\d+)")
+
+    def __init__(self, backend=None):
+        if backend is None:
+            backend = "lxml" if html is not None else "html.parser"
+        self.backend = backend
+
+    def _parse_page_lxml(self, page_text):
+        if not page_text.strip():
+            return []
+        if isinstance(page_text, bytes):
+            page_text = UnicodeDammit(page_text).unicode_markup
+        try:
+            root = html.document_fromstring(page_text)
+        except etree.ParserError:
+            # No elements in the page
+            return []
+        games = []
+        for game_tag in root.xpath(
+                "//section[contains(concat(' ', normalize-space(@class), ' '), ' gamebox ')]"):
+            h2 = game_tag.find(".//h2")
+            if h2 is not None:
+                name = str(_tag_string(h2.find(".//b"))).strip()
+                platform = str(_tag_string(game_tag.find(".//div").find(".//b"))).strip()
+                status = GameStatus(h2.find(".//img").get("alt"))
+                game = Game.intern(name, platform, status)
+                games.append(game)
+        return games
+
+    def _parse_page_soup(self, page_text):
         soup = BeautifulSoup(page_text, features="html.parser")
         games = []
         for game_tag in soup.find_all("section", class_="gamebox"):
@@ -20,12 +87,37 @@ class GamePageParser:
                 name = str(game_tag.h2.b.string).strip()
                 platform = str(game_tag.div.b.string).strip()
                 status = GameStatus(game_tag.h2.img["alt"])
-                game = Game(name, platform, status)
+                game = Game.intern(name, platform, status)
                 games.append(game)
         return games
 
+    def parse_total(self, page_text):
+        """
+        Returns the total number of games in the search, or None if unknown
+
+        The value is taken from the total param of the request for the next
+        page, when the page has one
+        """
+        if isinstance(page_text, bytes):
+            page_text = page_text.decode("utf-8", "replace")
+        match = self.total_pattern.search(page_text)
+        return int(match.group(1)) if match else None
+
+    def parse_page(self, page_text):
+        start = time.perf_counter()
+        if self.backend == "lxml":
+            games = self._parse_page_lxml(page_text)
+        else:
+            games = self._parse_page_soup(page_text)
+        metrics.emit("parse", site="backloggery.com", parse_time=time.perf_counter() - start,
+                     rows=len(games))
+        return games
+
 
 class SiteApi:
+    url = "http://backloggery.com/ajax_moregames.php"
+    cache_ttl = 60 * 60
+    inflight = SingleFlight()
     default_search_params = {
         "console": "",
         "rating": "",
@@ -44,10 +136,14 @@ class SiteApi:
         "ajid": 0,
     }
 
-    def __init__(self, username):
+    def __init__(self, username, cache=None, session=None, throttle=None):
         self.username = username
+        self.cache = cache
+        self.session = session if session is not None else default_session()
+        self.throttle = throttle if throttle is not None else host_throttle(urlparse(self.url).netloc)
 
-    def _get_status(self, status):
+    @staticmethod
+    def _get_status(status):
         status_number_map = {
             GameStatus.unplayed: ("", 1),
             GameStatus.unfinished: (1, 0),
@@ -58,57 +154,233 @@ class SiteApi:
         }
         return status_number_map[status]
 
-    def get_page(self, extra_params={}):
-        url = "http://backloggery.com/ajax_moregames.php"
-        params = self.default_search_params.copy()
+    @classmethod
+    def search_params(cls, username, extra_params={}):
+        """
+        Returns the search params for a user's library, without needing a SiteApi
+        """
+        params = cls.default_search_params.copy()
         params.update(extra_params)
-        params["user"] = self.username
+        params["user"] = username
         if "status" in extra_params:
-            status_val, unplayed_val = self._get_status(extra_params["status"])
+            status_val, unplayed_val = cls._get_status(extra_params["status"])
             params["status"] = status_val
             params["unplayed"] = unplayed_val
-        response = requests.get(url, params=params)
+        return params
+
+    def build_params(self, extra_params={}):
+        return self.search_params(self.username, extra_params)
+
+    def get_page(self, extra_params={}):
+        params = self.build_params(extra_params)
+        key = make_key(self.url, params)
+        # Only fetches through the same session and cache are shared, so
+        # that eg: a replay is never answered by a live request
+        flight = (id(self.session), id(self.cache), key)
+        return self.inflight.do(flight, lambda: self._fetch(key, params))
+
+    def _fetch(self, key, params):
+        if self.cache is not None:
+            content = self.cache.get(key)
+            metrics.emit("cache", site="backloggery.com", hit=content is not None)
+            if content is not None:
+                return content
+        response = self.throttle.send(lambda: self.session.get(self.url, params=params))
+        if self.cache is not None:
+            self.cache.set(key, response.content, self.cache_ttl)
         return response.content
 
 
 class Backloggery:
     NUM_PAGE_RESULTS = 50
+    MAX_PARALLEL_QUERIES = 8
+    FILTER_PARAMS = {
+        "platform": "console",
+        "status": "status",
+        "rating": "rating",
+        "own": "own",
+        "region": "region",
+        "wish": "wish",
+        "search": "search",
+    }
 
     parser = GamePageParser()
 
-    def __init__(self, username):
-        self.api = SiteApi(username)
+    def __init__(self, username, cache=None, session=None, throttle=None):
+        self.api = SiteApi(username, cache, session, throttle)
 
     def _find_page(self, params={}):
         page = self.api.get_page(params)
         return self.parser.parse_page(page)
 
-    def find(self, extra_params={}):
-        count = 0
-        params = {"ajid": count}
+    def _page_params(self, extra_params, offset):
+        params = {"ajid": offset}
         params.update(extra_params)
-        games = []
+        params["ajid"] = offset
+        return params
+
+    def _find_first_page(self, params):
+        page = self.api.get_page(params)
+        return self.parser.parse_page(page), self.parser.parse_total(page)
+
+    def _iter_pages_sequential(self, extra_params, count, page_size):
         has_more = True
         while has_more:
-            params["ajid"] = count
-            games_page = self._find_page(params)
-            games += games_page
+            games_page = self._find_page(self._page_params(extra_params, count))
+            yield games_page
             count += len(games_page)
-            has_more = len(games_page) == self.NUM_PAGE_RESULTS
+            has_more = len(games_page) == page_size
+
+    def _iter_pages_concurrent(self, extra_params, count, page_size, workers):
+        """
+        Fetch a window of `workers` pages at once.
+
+        Every page except the last one is full, so the offsets of the next
+        pages are known in advance. Pages after the first short page in a
+        window are discarded, so the result is the same as the sequential path
+        """
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                offsets = [count + i * page_size for i in range(workers)]
+                params_list = [self._page_params(extra_params, offset) for offset in offsets]
+                for games_page in executor.map(self._find_page, params_list):
+                    yield games_page
+                    count += len(games_page)
+                    if len(games_page) != page_size:
+                        return
+
+    def _iter_planned_pages(self, extra_params, page_size, total, workers):
+        params_list = [self._page_params(extra_params, offset)
+                       for offset in range(page_size, total, page_size)]
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                yield from executor.map(self._find_page, params_list)
+        else:
+            yield from map(self._find_page, params_list)
+
+    def iter_pages(self, extra_params={}, workers=1):
+        """
+        Yields each page of games
+
+        The page size is taken from the first page. When the page gives a
+        total larger than the first page, the offsets of the remaining pages
+        are known and they are fetched without probing for the end. A total
+        no larger than the first page may be a running count rather than the
+        size of the library, so then pages are fetched until one comes back
+        short, as when there is no total.
+        """
+        first_page, total = self._find_first_page(self._page_params(extra_params, 0))
+        yield first_page
+        page_size = len(first_page)
+        if page_size and total is not None and total > page_size:
+            yield from self._iter_planned_pages(extra_params, page_size, total, workers)
+            return
+        if page_size < self.NUM_PAGE_RESULTS:
+            return
+        if workers > 1:
+            yield from self._iter_pages_concurrent(extra_params, page_size, page_size, workers)
+        else:
+            yield from self._iter_pages_sequential(extra_params, page_size, page_size)
+
+    def iter_games(self, extra_params={}, workers=1):
+        """
+        Yields games as each page is parsed, without waiting for the later pages
+        """
+        pages = 0
+        for games_page in self.iter_pages(extra_params, workers):
+            pages += 1
+            yield from games_page
+        metrics.emit("find", site="backloggery.com", pages=pages)
+
+    def _filter_queries(self, extra_params, filters):
+        """
+        Returns the search params for each combination of filter values
+
+        A filter can be given a list of values, eg: status=[GameStatus.unplayed,
+        GameStatus.unfinished]. The site only accepts one value per param, so
+        that becomes one query per value. Repeated values only make one query,
+        and an empty list makes none.
+        """
+        names = []
+        values = []
+        for name, value in filters.items():
+            if name not in self.FILTER_PARAMS:
+                raise TypeError("Unknown filter: {}".format(name))
+            names.append(self.FILTER_PARAMS[name])
+            values.append(value if isinstance(value, (list, tuple, set)) else [value])
+        queries = {}
+        for combination in product(*values):
+            params = dict(extra_params)
+            params.update(zip(names, combination))
+            queries.setdefault(tuple(sorted(params.items())), params)
+        return list(queries.values())
+
+    def find(self, extra_params={}, workers=1, **filters):
+        """
+        Returns the user's games, filtered on the site by the keyword arguments
+
+        Supported filters are the keys of FILTER_PARAMS. Queries for multi
+        valued filters run in parallel, at most MAX_PARALLEL_QUERIES at a
+        time, and a game returned by more than one of them is only included
+        once.
+        """
+        queries = self._filter_queries(extra_params, filters)
+        if not queries:
+            return []
+        if len(queries) == 1:
+            return list(self.iter_games(queries[0], workers))
+        with ThreadPoolExecutor(max_workers=min(len(queries), self.MAX_PARALLEL_QUERIES)) as executor:
+            results = list(executor.map(lambda params: self.find(params, workers), queries))
+        games = []
+        seen = set()
+        for query_games in results:
+            games += [game for game in query_games if game not in seen]
+            seen.update(query_games)
         return games
 
 
 class Game:
+    """
+    A game in a user's list
+
+    Games are hashable and Game.intern shares a single object between equal
+    games, so they cannot be modified once created.
+    """
+    __slots__ = ("name", "platform", "status", "__weakref__")
+
+    _interned = weakref.WeakValueDictionary()
+
     def __init__(self, name, platform, status):
-        self.name = name
-        self.platform = platform
-        self.status = status
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "platform", platform)
+        object.__setattr__(self, "status", status)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Game objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Game objects are immutable")
+
+    def __reduce__(self):
+        return type(self), (self.name, self.platform, self.status)
+
+    @classmethod
+    def intern(cls, name, platform, status):
+        key = (name, platform, status)
+        game = cls._interned.get(key)
+        if game is None:
+            game = cls(sys.intern(name), sys.intern(platform), status)
+            cls._interned[key] = game
+        return game
 
     def __eq__(self, obj):
         return (self.name == obj.name and
                 self.platform == obj.platform and
                 self.status == obj.status)
 
+    def __hash__(self):
+        return hash((self.name, self.platform, self.status))
+
     def __str__(self):
         return "<{}>".format(self.name)
 
@@ -117,3 +389,40 @@ class Game:
             name=self.name,
             platform=self.platform,
             status=self.status)
+
+
+class GameTable:
+    """
+    Column store for a large number of games
+
+    Keeps names, platforms and statuses in three columns rather than one
+    object per game. Platform names are interned and statuses are stored as
+    one byte each. Indexing and iterating return Game objects.
+    """
+    statuses = list(GameStatus)
+
+    def __init__(self, games=()):
+        self.names = []
+        self.platforms = []
+        self.status_codes = array("b")
+        self.extend(games)
+
+    def append(self, game):
+        self.names.append(game.name)
+        self.platforms.append(sys.intern(game.platform))
+        self.status_codes.append(self.statuses.index(game.status))
+
+    def extend(self, games):
+        for game in games:
+            self.append(game)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        return Game(self.names[index], self.platforms[index],
+                    self.statuses[self.status_codes[index]])
+
+    def __iter__(self):
+        for name, platform, code in zip(self.names, self.platforms, self.status_codes):
+            yield Game(name, platform, self.statuses[code])
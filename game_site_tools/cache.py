@@ -0,0 +1,172 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(url, params):
+    """
+    Builds a cache key from a request url and its params
+
+    The params are serialised with sorted keys so that the same request
+    always gives the same key irrespective of dict ordering
+    """
+    return url + "?" + json.dumps(params, sort_keys=True, default=str)
+
+
+class Cache:
+    """
+    Base class for the cache tiers
+
+    Subclasses store (value, expires) pairs by implementing _get, _set and
+    _delete. This class takes care of expiry and the hit/miss counters.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_entry(self, key):
+        entry = self._get(key)
+        if entry is not None and entry[1] < time.time():
+            self._delete(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def set_entry(self, key, value, expires):
+        self._set(key, value, expires)
+
+    def set(self, key, value, ttl):
+        self.set_entry(key, value, time.time() + ttl)
+
+    def delete(self, key):
+        self._delete(key)
+
+
+class MemoryCache(Cache):
+    """
+    In memory LRU cache holding at most `max_entries` items
+    """
+    def __init__(self, max_entries=1024):
+        super().__init__()
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def _set(self, key, value, expires):
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class SqliteCache(Cache):
+    """
+    On disk cache stored in a sqlite database
+
+    Holds at most `max_entries` items, evicting the least recently used ones
+    """
+    def __init__(self, path, max_entries=100000):
+        super().__init__()
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def _get(self, key):
+        with self.lock, self.db:
+            row = self.db.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (time.time(), key))
+            return row
+
+    def _set(self, key, value, expires):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, expires, time.time()))
+            self.db.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+
+    def _delete(self, key):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def close(self):
+        self.db.close()
+
+
+class TieredCache(Cache):
+    """
+    Chains caches from fastest to slowest
+
+    A hit in a slower tier is copied into the faster tiers. Writes go to
+    every tier.
+    """
+    def __init__(self, *tiers):
+        super().__init__()
+        self.tiers = tiers
+
+    def _get(self, key):
+        for index, tier in enumerate(self.tiers):
+            entry = tier.get_entry(key)
+            if entry is not None:
+                for faster_tier in self.tiers[:index]:
+                    faster_tier.set_entry(key, *entry)
+                return entry
+        return None
+
+    def _set(self, key, value, expires):
+        for tier in self.tiers:
+            tier.set_entry(key, value, expires)
+
+    def _delete(self, key):
+        for tier in self.tiers:
+            tier._delete(key)
+
+
+def persistent_cache(path, memory_entries=1024, disk_entries=100000):
+    """
+    Returns an in memory LRU cache backed by a sqlite file at `path`
+    """
+    return TieredCache(MemoryCache(memory_entries), SqliteCache(path, disk_entries))
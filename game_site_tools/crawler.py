@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .backloggery import Backloggery, Game, GameStatus
+
+
+def _to_rows(games):
+    return [[game.name, game.platform, game.status.value] for game in games]
+
+
+def _from_rows(rows):
+    return [Game(name, platform, GameStatus(status)) for name, platform, status in rows]
+
+
+class CrawlCheckpoint:
+    """
+    Saves the progress of a crawl to a journal file
+
+    Each page of games and each finished user is appended to the file as a
+    line of json, so saving costs the same however far the crawl has got.
+    Loading replays the journal into the users that are finished, and the
+    offset and games fetched so far for users that are part way through.
+    Pages added later are only in the file, not in `partial`.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.partial = {}
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line was cut short by an interrupted crawl
+                    break
+                username = record["user"]
+                if record.get("done"):
+                    self.done.add(username)
+                    self.partial.pop(username, None)
+                    continue
+                offset, games = self.partial.get(username, (0, []))
+                if record["offset"] == offset:
+                    games.extend(_from_rows(record["games"]))
+                    self.partial[username] = (offset + len(record["games"]), games)
+        self._compact()
+
+    def _compact(self):
+        """
+        Rewrites the journal without the pages of finished users
+        """
+        with open(self.path + ".tmp", "w") as f:
+            for username in sorted(self.done):
+                f.write(json.dumps({"user": username, "done": True}) + "\n")
+            for username, (offset, games) in self.partial.items():
+                f.write(json.dumps({"user": username, "offset": 0, "games": _to_rows(games)}) + "\n")
+        os.replace(self.path + ".tmp", self.path)
+
+    def _append(self, record):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def add_page(self, username, offset, games):
+        """
+        Records a page of games fetched from `offset` for a user that is not finished
+        """
+        self._append({"user": username, "offset": offset, "games": _to_rows(games)})
+
+    def finish(self, username):
+        self._append({"user": username, "done": True})
+        self.partial.pop(username, None)
+        self.done.add(username)
+
+
+class BulkCrawler:
+    """
+    Fetches the games of many Backloggery users on a shared pool of threads
+
+    Users take turns, one page each, so a user with a huge library does not
+    hold up everyone else. At most `per_host` requests are sent to a host at
+    once. Each user's games are passed to on_user_done(username, games) when
+    their last page has been fetched, or kept in `results` if it is not given.
+    If a checkpoint path is given, every page is added to it and a crawl that
+    was interrupted carries on where it stopped. The users finished before the
+    interruption are not fetched again, so on_user_done is then required to
+    have somewhere to keep the games that outlasts the crawler.
+    """
+    def __init__(self, usernames, on_user_done=None, checkpoint=None, workers=8, per_host=4,
+                 backloggery_factory=Backloggery):
+        if checkpoint and on_user_done is None:
+            raise ValueError("on_user_done is required with a checkpoint")
+        self.usernames = list(dict.fromkeys(usernames))
+        self.results = {}
+        self.on_user_done = on_user_done if on_user_done is not None else self.results.__setitem__
+        self.checkpoint = CrawlCheckpoint(checkpoint) if checkpoint else None
+        self.workers = workers
+        self.host_slots = threading.BoundedSemaphore(per_host)
+        self.backloggery_factory = backloggery_factory
+        self.errors = {}
+
+    def _fetch(self, backloggery, offset):
+        with self.host_slots:
+            return backloggery._find_page(backloggery._page_params({}, offset))
+
+    def run(self):
+        """
+        Crawls every user. Returns a dict of the users that failed and their error
+        """
+        progress = {}
+        queue = deque()
+        for username in self.usernames:
+            if self.checkpoint is not None and username in self.checkpoint.done:
+                continue
+            offset, games = 0, []
+            if self.checkpoint is not None and username in self.checkpoint.partial:
+                offset, games = self.checkpoint.partial[username]
+            progress[username] = (self.backloggery_factory(username), offset, games, None)
+            queue.append(username)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            running = {}
+            while queue or running:
+                while queue and len(running) < self.workers:
+                    username = queue.popleft()
+                    backloggery, offset, _, _ = progress[username]
+                    running[executor.submit(self._fetch, backloggery, offset)] = username
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    username = running.pop(future)
+                    self._page_done(username, future, progress, queue)
+        return self.errors
+
+    def _page_done(self, username, future, progress, queue):
+        backloggery, offset, games, page_size = progress.pop(username)
+        try:
+            games_page = future.result()
+        except Exception as e:
+            self.errors[username] = e
+            return
+        games.extend(games_page)
+        # As in Backloggery.iter_pages, the page size is learned from the
+        # first page fetched, and a shorter page is the last one
+        if page_size is None:
+            more = len(games_page) >= backloggery.NUM_PAGE_RESULTS
+            page_size = len(games_page)
+        else:
+            more = len(games_page) == page_size
+        if more:
+            progress[username] = (backloggery, offset + len(games_page), games, page_size)
+            queue.append(username)
+            if self.checkpoint is not None:
+                self.checkpoint.add_page(username, offset, games_page)
+        else:
+            self.on_user_done(username, games)
+            if self.checkpoint is not None:
+                self.checkpoint.finish(username)
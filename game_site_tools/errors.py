@@ -0,0 +1,15 @@
+class SiteError(Exception):
+    """
+    A request to a site failed
+
+    `status` is the HTTP status code, or None if no response was received
+    """
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(SiteError):
+    """
+    A site has failed too often recently, so the request was not sent
+    """
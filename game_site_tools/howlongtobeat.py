@@ -1,21 +1,86 @@
 import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 
-import requests
 from bs4 import BeautifulSoup
 
+from .cache import MemoryCache, make_key
+from .coalesce import SingleFlight
+from .metrics import metrics
+from .session import default_session
+from .throttle import host_throttle
+from .titles import number_variants, query_variants, normalize, strip_subtitle, TitleIndex
+
+LookupResult = namedtuple("LookupResult", ["name", "time", "error"])
+HltbEntry = namedtuple("HltbEntry", ["id", "title", "main", "main_extra", "completionist"])
+
 
 class GamePageParser:
-    def _extract_hour(self, element):
-        value = re.findall(r"^\d+", str(element.string))
-        return int(value[0]) if value else 0
+    hours_pattern = re.compile(r"^(\d+)(½?)\s*(\w*)")
+    id_pattern = re.compile(r"id=(\d+)")
+    time_columns = {
+        "Main Story": "main",
+        "Main + Extra": "main_extra",
+        "Completionist": "completionist",
+    }
 
-    def get_story_hours(self, page):
+    def _extract_hours(self, element):
+        """
+        Returns the time in an element as fractional hours, or None for N/A
+
+        eg: "12½ Hours" -> 12.5, "45 Mins" -> 0.75
+        """
+        value = self.hours_pattern.findall(element.get_text(strip=True))
+        if not value:
+            return None
+        whole, half, unit = value[0]
+        hours = int(whole) + (0.5 if half else 0)
+        if unit.lower().startswith("min"):
+            hours = hours / 60
+        return hours
+
+    def get_entries(self, page):
+        """
+        Returns a HltbEntry for every search hit on the page, in page order
+        """
+        start = time.perf_counter()
         soup = BeautifulSoup(page, features="html.parser")
-        base_element = soup.find_all(class_="search_list_tidbit")
-        if not base_element:
+        entries = []
+        for hit in soup.find_all("li"):
+            link = hit.h3.a if hit.h3 else None
+            if link is None:
+                continue
+            game_id = self.id_pattern.findall(link.get("href", ""))
+            title = link.get("title") or link.get_text(strip=True)
+            times = {}
+            tidbits = hit.find_all(class_="search_list_tidbit")
+            for label, value in zip(tidbits[::2], tidbits[1::2]):
+                column = self.time_columns.get(label.get_text(strip=True))
+                if column:
+                    times[column] = self._extract_hours(value)
+            entries.append(HltbEntry(int(game_id[0]) if game_id else None,
+                                     title,
+                                     times.get("main"),
+                                     times.get("main_extra"),
+                                     times.get("completionist")))
+        metrics.emit("parse", site="howlongtobeat.com", parse_time=time.perf_counter() - start,
+                     rows=len(entries))
+        return entries
+
+    def story_hours(self, entries):
+        """
+        Returns the main story hours of the first entry, 0 if it has no time
+        or None if there are no entries
+        """
+        if not entries:
             # No search hits
-            return 0
-        return self._extract_hour(base_element[1])
+            return None
+        return entries[0].main or 0
+
+    def get_story_hours(self, page):
+        return self.story_hours(self.get_entries(page))
 
 
 class SiteApi:
@@ -26,9 +91,16 @@ class SiteApi:
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:94.0) Gecko/20100101 Firefox/94.0"
     }
+    cache_ttl = 30 * 24 * 60 * 60
+    inflight = SingleFlight()
 
-    def get_page(self, query):
-        data = {
+    def __init__(self, cache=None, session=None, throttle=None):
+        self.cache = cache
+        self.session = session if session is not None else default_session()
+        self.throttle = throttle if throttle is not None else host_throttle(urlparse(self.url).netloc)
+
+    def build_data(self, query):
+        return {
             "queryString": query,
             "t": "games",
             "sorthead": "name",
@@ -43,35 +115,178 @@ class SiteApi:
             "g": "",
             "randomize": 0
         }
-        response = requests.post(self.url, headers=self.headers, data=data, params=self.params)
+
+    def cache_key(self, query):
+        return make_key(self.url, self.build_data(query))
+
+    def get_page(self, query):
+        data = self.build_data(query)
+        key = self.cache_key(query)
+        # Only fetches through the same session and cache are shared, so
+        # that eg: a replay is never answered by a live request
+        flight = (id(self.session), id(self.cache), key)
+        return self.inflight.do(flight, lambda: self._fetch(key, data))
+
+    def _fetch(self, key, data):
+        if self.cache is not None:
+            content = self.cache.get(key)
+            metrics.emit("cache", site="howlongtobeat.com", hit=content is not None)
+            if content is not None:
+                return content
+        response = self.throttle.send(
+            lambda: self.session.post(self.url, headers=self.headers, data=data, params=self.params))
+        if self.cache is not None:
+            self.cache.set(key, response.content, self.cache_ttl)
         return response.content
 
+    def forget_page(self, query):
+        """
+        Drops a page from the cache, eg: a page with no hits, which should
+        only be remembered for as long as the negative cache says
+        """
+        if self.cache is not None:
+            self.cache.delete(self.cache_key(query))
+
 
 class HowLongToBeat:
+    """
+    Looks up how long games take to beat
+
+    When a name has no hits, find searches for the variants from
+    titles.query_variants on a pool of `variant_workers` threads. The best
+    ranked variant with a confident hit wins. find returns None when nothing
+    matches, as opposed to 0 for a game with no recorded time.
+
+    Names that never match are remembered in a negative cache, `misses`, for
+    `miss_ttl` seconds so that they cost no requests until the entry expires.
+    By default misses go in the lookup cache when one is given, else in
+    memory.
+    """
     api = SiteApi()
     parser = GamePageParser()
 
-    def _has_number_in_name(self, name):
-        return re.findall(r"\d+", name) != []
+    index = None
+    variant_workers = 4
+    miss_ttl = 7 * 24 * 60 * 60
 
-    def _convert_to_roman(self, name):
-        roman_list = ["", "I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X"]
-        number = int(re.findall(r"\d+", name)[0])
-        if number > 10:
-            # A large number is generally part of the name, eg: 1701 A.D
-            return name
-        roman = roman_list[number]
-        return re.sub(r"\d+", roman, name)
+    def __init__(self, cache=None, session=None, index=None, throttle=None, variant_workers=None,
+                 misses=None, miss_ttl=None):
+        if cache is not None or session is not None or throttle is not None:
+            self.api = SiteApi(cache, session, throttle)
+        if index is not None:
+            self.index = index
+        if variant_workers is not None:
+            self.variant_workers = variant_workers
+        if misses is None:
+            misses = cache if cache is not None else MemoryCache()
+        self.misses = misses
+        if miss_ttl is not None:
+            self.miss_ttl = miss_ttl
 
     def _find_game(self, game_name):
+        return self.parser.story_hours(self.find_entries(game_name))
+
+    def _matching_entry(self, variant, entries):
+        matches = TitleIndex()
+        matches.add_entries(entries)
+        entry = matches.lookup(variant)
+        if entry is not None:
+            return entry
+        key = normalize(variant)
+        for entry in entries:
+            if normalize(strip_subtitle(entry.title)) == key:
+                return entry
+        return None
+
+    def _find_variant(self, variant, first_hit=False):
+        """
+        Returns the hours for a variant only when one of the hits matches it,
+        else None
+
+        A shortened name such as a title without its subtitle often matches
+        other games, so the first hit is not good enough. A hit matches when
+        its title, with or without the subtitle, is close to the variant.
+        The numbers swapped in the full name are as good as the name itself,
+        so for those the first hit is taken, as for the name.
+        """
+        entries = self.find_entries(variant)
+        if first_hit:
+            return self.parser.story_hours(entries)
+        entry = self._matching_entry(variant, entries)
+        return self.parser.story_hours([entry] if entry is not None else [])
+
+    def _find_variants(self, game_name, variants):
+        """
+        Searches for all the variants at once and returns (hours, queries)
+        """
+        swaps = number_variants(game_name)
+        with ThreadPoolExecutor(max_workers=self.variant_workers) as executor:
+            futures = [executor.submit(self._find_variant, variant, variant in swaps)
+                       for variant in variants]
+            hours = None
+            for future in futures:
+                hours = future.result()
+                if hours is not None:
+                    break
+            cancelled = sum(1 for future in futures if future.cancel())
+        return hours, len(futures) - cancelled
+
+    def _miss_key(self, game_name):
+        return make_key(self.api.url + "#miss", {"queryString": game_name})
+
+    def find_entries(self, game_name):
+        """
+        Returns all the search hits for a name, with every time column
+        """
         page = self.api.get_page(game_name)
-        return self.parser.get_story_hours(page)
+        entries = self.parser.get_entries(page)
+        if not entries:
+            self.api.forget_page(game_name)
+        if self.index is not None:
+            self.index.add_entries(entries)
+        return entries
 
     def find(self, game_name):
-        time = self._find_game(game_name)
-        if not time and self._has_number_in_name(game_name):
+        if self.index is not None:
+            entry = self.index.lookup(game_name)
+            if entry is not None and entry.main:
+                metrics.emit("find", site="howlongtobeat.com", queries=0, found=1)
+                return entry.main
+        miss_key = self._miss_key(game_name)
+        if self.misses.get(miss_key) is not None:
+            metrics.emit("find", site="howlongtobeat.com", queries=0, found=0)
+            return None
+        queries = 1
+        hours = self._find_game(game_name)
+        variants = query_variants(game_name)
+        if hours is None and variants:
             # Games in a series sometimes have number stored in roman
-            # eg: Kings Quest 2 -> Kings Quest II
-            new_name = self._convert_to_roman(game_name)
-            time = self._find_game(new_name)
-        return time
+            # eg: Kings Quest 2 -> Kings Quest II, and backlogs often have
+            # editions or platforms in the name
+            hours, variant_queries = self._find_variants(game_name, variants)
+            queries += variant_queries
+        if hours is None:
+            self.misses.set(miss_key, b"1", self.miss_ttl)
+        metrics.emit("find", site="howlongtobeat.com", queries=queries,
+                     found=0 if hours is None else 1)
+        return hours
+
+    def lookup(self, game_name):
+        """
+        Like find, but returns a LookupResult with any exception in `error`
+        """
+        try:
+            return LookupResult(game_name, self.find(game_name), None)
+        except Exception as e:
+            return LookupResult(game_name, None, e)
+
+    def find_many(self, game_names, workers=4):
+        """
+        Look up many games on a pool of `workers` threads
+
+        Returns a LookupResult for each name, in the same order as the input.
+        A failed lookup has its exception in `error` instead of stopping the
+        rest of the batch
+        """
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.lookup, game_names))
@@ -0,0 +1,125 @@
+"""
+Instrumentation events
+
+Every request, parse and lookup emits an event on `metrics`. Subscribe a
+callable to receive them, eg: a MetricsRecorder or a StatsdExporter.
+
+Events and their fields:
+
+    request: site, latency, bytes, status, retries
+    cache:   site, hit
+    parse:   site, parse_time, rows
+    find:    site, pages (Backloggery) or queries and found (HowLongToBeat)
+"""
+import socket
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    def __init__(self):
+        self.listeners = []
+
+    def subscribe(self, listener):
+        """
+        Calls listener(event, fields) for every event
+        """
+        self.listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def emit(self, event, **fields):
+        for listener in list(self.listeners):
+            listener(event, fields)
+
+
+metrics = Metrics()
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class MetricsRecorder:
+    """
+    Aggregates events into counters
+
+    For each event and site it counts the events and sums their numeric
+    fields. Requests are also counted by status code.
+    """
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def __call__(self, event, fields):
+        labels = (("site", fields.get("site", "")),)
+        with self.lock:
+            self.counters[(event + "_total", labels)] += 1
+            for name, value in fields.items():
+                if name != "status" and _is_number(value):
+                    self.counters[("{}_{}_sum".format(event, name), labels)] += value
+            if event == "request":
+                status_labels = labels + (("status", str(fields.get("status"))),)
+                self.counters[("request_status_total", status_labels)] += 1
+            if event == "cache" and fields.get("hit"):
+                self.counters[("cache_hits_total", labels)] += 1
+
+    def get(self, name, site):
+        return self.counters.get((name, (("site", site),)), 0)
+
+    def cache_hit_ratio(self, site):
+        lookups = self.get("cache_total", site)
+        return self.get("cache_hits_total", site) / lookups if lookups else 0.0
+
+    def prometheus(self, prefix="game_site_tools"):
+        """
+        Returns the counters in the Prometheus text exposition format
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+        lines = []
+        previous_name = None
+        for (name, labels), value in counters:
+            metric = "{}_{}".format(prefix, name)
+            if name != previous_name:
+                lines.append("# TYPE {} counter".format(metric))
+                previous_name = name
+            label_text = ",".join('{}="{}"'.format(key, val) for key, val in labels)
+            lines.append("{}{{{}}} {}".format(metric, label_text, value))
+        return "\n".join(lines) + "\n"
+
+
+class StatsdExporter:
+    """
+    Sends events to a StatsD server over UDP
+
+    Each event is sent as a counter, and its numeric fields as timings when
+    they are in seconds (latency, parse_time) or counters otherwise.
+    """
+    timing_fields = ("latency", "parse_time")
+
+    def __init__(self, host="localhost", port=8125, prefix="game_site_tools"):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def format(self, event, fields):
+        name = "{}.{}.{}".format(self.prefix, fields.get("site", "unknown"), event)
+        lines = ["{}:1|c".format(name)]
+        for field, value in sorted(fields.items()):
+            if field == "status" or not _is_number(value):
+                continue
+            if field in self.timing_fields:
+                lines.append("{}.{}:{:.3f}|ms".format(name, field, value * 1000))
+            else:
+                lines.append("{}.{}:{}|c".format(name, field, value))
+        return "\n".join(lines)
+
+    def __call__(self, event, fields):
+        try:
+            self.sock.sendto(self.format(event, fields).encode("utf-8"), self.address)
+        except OSError:
+            # Metrics must never break a crawl
+            pass
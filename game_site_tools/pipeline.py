@@ -0,0 +1,94 @@
+"""
+Fetch pages on threads and parse them on a pool of processes
+
+Parsing with BeautifulSoup is CPU bound, so in a large crawl it holds the GIL
+while the fetching threads wait. fetch_and_parse hands each raw page to a
+process pool instead, so parsing scales with the number of cores:
+
+    api = howlongtobeat.SiteApi()
+    for result in fetch_and_parse(api.get_page, names, parse_story_hours):
+        print(result.item, result.value)
+
+The parse function is sent to other processes, so it must be a module level
+function such as the ones below.
+
+The worker processes are started with forkserver, or spawn where that is not
+available, as forking while the fetch threads hold locks can deadlock the
+children. The metrics events emitted while parsing are sent back and emitted
+again in this process.
+"""
+import multiprocessing
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from . import backloggery, howlongtobeat
+from .metrics import metrics
+
+PipelineResult = namedtuple("PipelineResult", ["item", "value", "error"])
+
+_backloggery_parser = backloggery.GamePageParser()
+_hltb_parser = howlongtobeat.GamePageParser()
+
+
+def parse_backloggery_page(page):
+    return _backloggery_parser.parse_page(page)
+
+
+def parse_story_hours(page):
+    return _hltb_parser.get_story_hours(page)
+
+
+def parse_hltb_entries(page):
+    return _hltb_parser.get_entries(page)
+
+
+def _parse_with_events(parse, page):
+    """
+    Runs in a worker process and returns parse(page) with the events it emitted
+    """
+    events = []
+    listener = metrics.subscribe(lambda event, fields: events.append((event, fields)))
+    try:
+        return parse(page), events
+    finally:
+        metrics.unsubscribe(listener)
+
+
+def _process_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _result(item, fetch_future):
+    try:
+        value, events = fetch_future.result().result()
+    except Exception as e:
+        return PipelineResult(item, None, e)
+    for event, fields in events:
+        metrics.emit(event, **fields)
+    return PipelineResult(item, value, None)
+
+
+def fetch_and_parse(fetch, items, parse, fetch_workers=8, parse_workers=None, max_pending=32):
+    """
+    Yields a PipelineResult for each item, in the same order as `items`
+
+    fetch(item) runs on a pool of `fetch_workers` threads and parse(page) on a
+    pool of `parse_workers` processes, by default one per core. At most
+    `max_pending` items are fetched or parsed ahead of the consumer, which
+    bounds memory use when the consumer is slower than the pipeline. A
+    failure to fetch or parse an item is returned in `error`.
+    """
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetchers, \
+            ProcessPoolExecutor(max_workers=parse_workers, mp_context=_process_context()) as parsers:
+
+        def fetch_then_parse(item):
+            return parsers.submit(_parse_with_events, parse, fetch(item))
+
+        pending = deque()
+        for item in items:
+            pending.append((item, fetchers.submit(fetch_then_parse, item)))
+            if len(pending) >= max_pending:
+                yield _result(*pending.popleft())
+        while pending:
+            yield _result(*pending.popleft())
@@ -0,0 +1,136 @@
+"""
+Record and replay SiteApi traffic
+
+A RecordingSession wraps a real session and saves every response to a sqlite
+database. A ReplaySession serves them back from the database without
+touching the network, so crawls can be re-run for benchmarking or parser
+upgrades:
+
+    with RecordingSession(make_session(), "pages.db") as session:
+        Backloggery("username", session=session).find()
+
+    replay = ReplaySession("pages.db")
+    Backloggery("username", session=replay, throttle=replay_throttle()).find()
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import zlib
+
+import requests
+
+from .cache import make_key
+from .throttle import HostThrottle, ThrottleSettings
+
+
+def request_key(method, url, params=None, data=None):
+    """
+    Returns the key a request is recorded under
+    """
+    key = make_key(method + " " + url, {"params": params or {}, "data": data or {}})
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class ReplayResponse:
+    def __init__(self, content, status_code):
+        self.content = content
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {}
+        self.raw = None
+
+
+def _connect(path):
+    db = sqlite3.connect(path, check_same_thread=False)
+    with db:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, request TEXT, status INTEGER, body BLOB)")
+    return db
+
+
+class RecordingSession:
+    """
+    Passes requests on to `session` and records the responses in a sqlite database
+
+    Each response is stored as a deflated body with a json description of
+    the request and the status code. Every response is committed as soon as
+    it is recorded, so a recording that is interrupted keeps everything up
+    to that point. A request made again replaces the earlier response, so
+    when a throttle retries a failed request the final attempt is replayed.
+    """
+    def __init__(self, session, path):
+        self.session = session
+        self.lock = threading.Lock()
+        self.db = _connect(path)
+
+    def _record(self, method, url, params, data, response):
+        request = {"method": method, "url": url, "params": params, "data": data}
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (request_key(method, url, params, data), json.dumps(request, default=str),
+                 response.status_code, zlib.compress(response.content)))
+
+    def get(self, url, params=None, **kwargs):
+        response = self.session.get(url, params=params, **kwargs)
+        self._record("GET", url, params, None, response)
+        return response
+
+    def post(self, url, data=None, params=None, **kwargs):
+        response = self.session.post(url, data=data, params=params, **kwargs)
+        self._record("POST", url, params, data, response)
+        return response
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReplaySession:
+    """
+    Serves recorded responses from a sqlite database
+
+    Responses are looked up by primary key, so replaying runs at disk speed.
+    A request that was not recorded raises requests.ConnectionError, as if
+    the site could not be reached.
+    """
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = _connect(path)
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _replay(self, method, url, params, data):
+        with self.lock:
+            row = self.db.execute("SELECT status, body FROM responses WHERE key = ?",
+                                  (request_key(method, url, params, data),)).fetchone()
+        if row is None:
+            raise requests.ConnectionError("No recorded response for {} {}".format(method, url))
+        status, body = row
+        return ReplayResponse(zlib.decompress(body), status)
+
+    def get(self, url, params=None, **kwargs):
+        return self._replay("GET", url, params, None)
+
+    def post(self, url, data=None, params=None, **kwargs):
+        return self._replay("POST", url, params, data)
+
+    def close(self):
+        self.db.close()
+
+
+def replay_throttle():
+    """
+    Returns a throttle that does not hold back or retry requests, for use with a ReplaySession
+    """
+    return HostThrottle(ThrottleSettings(rate=1e9, burst=1e9, max_rate=1e9, retries=0))
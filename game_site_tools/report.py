@@ -0,0 +1,81 @@
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .backloggery import Backloggery, GameStatus
+from .howlongtobeat import HowLongToBeat
+
+BACKLOG_STATUSES = [GameStatus.unplayed, GameStatus.unfinished]
+
+BacklogReport = namedtuple("BacklogReport", [
+    "total_hours", "hours_by_platform", "hours_by_status", "games", "unmatched", "untimed", "errors"])
+
+
+class BacklogReportBuilder:
+    """
+    Works out how long a user's backlog will take to complete
+
+    Unplayed and unfinished games are streamed from Backloggery, and each
+    new title is looked up on HowLongToBeat as soon as it arrives, while the
+    later pages are still being fetched. A title is looked up once, even
+    when it is in the backlog for several platforms, with `workers` lookups
+    running in parallel.
+
+    Titles HowLongToBeat does not know are listed in `unmatched`, and titles
+    it knows but has no main story time for are listed in `untimed`.
+    """
+    def __init__(self, backloggery, hltb=None, workers=4, statuses=BACKLOG_STATUSES):
+        self.backloggery = backloggery
+        self.hltb = hltb if hltb is not None else HowLongToBeat()
+        self.workers = workers
+        self.statuses = statuses
+
+    def _backlog(self):
+        seen = set()
+        for status in self.statuses:
+            for game in self.backloggery.iter_games({"status": status}, self.workers):
+                if game not in seen:
+                    seen.add(game)
+                    yield game
+
+    def build(self):
+        games = []
+        lookups = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for game in self._backlog():
+                games.append(game)
+                if game.name not in lookups:
+                    lookups[game.name] = executor.submit(self.hltb.lookup, game.name)
+        results = {name: lookup.result() for name, lookup in lookups.items()}
+        hours_by_platform = defaultdict(int)
+        hours_by_status = defaultdict(int)
+        game_hours = []
+        unmatched = []
+        untimed = []
+        errors = {}
+        for game in games:
+            result = results[game.name]
+            if result.error is not None:
+                errors[game.name] = result.error
+                continue
+            if not result.time:
+                missing = unmatched if result.time is None else untimed
+                if game.name not in missing:
+                    missing.append(game.name)
+                continue
+            game_hours.append((game, result.time))
+            hours_by_platform[game.platform] += result.time
+            hours_by_status[game.status] += result.time
+        return BacklogReport(sum(hours for _, hours in game_hours),
+                             dict(hours_by_platform),
+                             dict(hours_by_status),
+                             game_hours,
+                             unmatched,
+                             untimed,
+                             errors)
+
+
+def backlog_report(username, workers=4):
+    """
+    Returns a BacklogReport for a Backloggery user
+    """
+    return BacklogReportBuilder(Backloggery(username), workers=workers).build()
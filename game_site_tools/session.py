@@ -0,0 +1,56 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+
+class TimeoutSession(requests.Session):
+    """
+    requests.Session which applies a default timeout to every request
+    """
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def make_session(pool_size=10, retries=3, backoff_factor=0.5, timeout=(5, 30)):
+    """
+    Creates a session with pooled keep-alive connections
+
+    Requests that fail with a connection error are retried up to `retries`
+    times with exponential backoff. 429 and 5xx responses are returned as
+    they are, so that the HostThrottle sees them and does the backoff.
+    `timeout` is a (connect, read) tuple in seconds.
+    """
+    session = TimeoutSession(timeout)
+    retry = Retry(total=retries,
+                  status=0,
+                  backoff_factor=backoff_factor,
+                  allowed_methods=None,
+                  respect_retry_after_header=False,
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def default_session():
+    """
+    Returns the session shared by all SiteApi objects that were not given one
+    """
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = make_session()
+        return _default_session
@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+
+from .backloggery import Game, GameStatus
+from .titles import normalize
+
+TIME_COLUMNS = ("main", "main_extra", "completionist")
+
+
+class GameStore:
+    """
+    Local sqlite database of users' games and HowLongToBeat times
+
+    Games and times are joined on the normalized title, so queries like the
+    total hours of unfinished PS2 games across all users run locally:
+
+        store.total_hours(platform="PS2", status=GameStatus.unfinished)
+    """
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS games (
+                    user TEXT, name TEXT, platform TEXT, status TEXT, title_key TEXT);
+                CREATE INDEX IF NOT EXISTS games_user ON games (user);
+                CREATE INDEX IF NOT EXISTS games_platform ON games (platform, status);
+                CREATE INDEX IF NOT EXISTS games_status ON games (status);
+                CREATE INDEX IF NOT EXISTS games_title_key ON games (title_key);
+                CREATE TABLE IF NOT EXISTS hltb_times (
+                    title_key TEXT PRIMARY KEY, hltb_id INTEGER, title TEXT,
+                    main REAL, main_extra REAL, completionist REAL);
+            """)
+
+    def close(self):
+        self.db.close()
+
+    def add_games(self, user, games):
+        """
+        Replaces the stored games of a user
+        """
+        rows = [(user, game.name, game.platform, game.status.value, normalize(game.name))
+                for game in games]
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM games WHERE user = ?", (user,))
+            self.db.executemany("INSERT INTO games VALUES (?, ?, ?, ?, ?)", rows)
+
+    def add_entries(self, entries):
+        """
+        Stores HltbEntry times, replacing any existing times for the same title
+        """
+        rows = [(normalize(entry.title), entry.id, entry.title,
+                 entry.main, entry.main_extra, entry.completionist)
+                for entry in entries]
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO hltb_times VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def add_times(self, times):
+        """
+        Stores main story hours from a {title: hours} dict, as returned by HowLongToBeat.find
+
+        The other columns of a title that is already stored are kept
+        """
+        rows = [(normalize(title), title, hours) for title, hours in times.items() if hours]
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT INTO hltb_times (title_key, title, main) VALUES (?, ?, ?) "
+                "ON CONFLICT (title_key) DO UPDATE SET main = excluded.main", rows)
+
+    def _where(self, user, platform, status):
+        clauses = []
+        args = []
+        for column, value in (("user", user), ("platform", platform), ("status", status)):
+            if value is None:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            if column == "status":
+                values = [game_status.value for game_status in values]
+            clauses.append("g.{} IN ({})".format(column, ", ".join("?" * len(values))))
+            args.extend(values)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, args
+
+    def games(self, user=None, platform=None, status=None):
+        where, args = self._where(user, platform, status)
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT g.name, g.platform, g.status FROM games g" + where, args).fetchall()
+        return [Game(name, platform, GameStatus(status)) for name, platform, status in rows]
+
+    def total_hours(self, user=None, platform=None, status=None, column="main"):
+        """
+        Sums a time column over the matching games. Each filter can be a value or a list
+        """
+        if column not in TIME_COLUMNS:
+            raise ValueError("Unknown time column: {}".format(column))
+        where, args = self._where(user, platform, status)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT SUM(h.{}) FROM games g JOIN hltb_times h ON g.title_key = h.title_key"
+                .format(column) + where, args).fetchone()
+        return row[0] or 0
+
+    def titles_without_times(self, user=None, platform=None, status=None):
+        where, args = self._where(user, platform, status)
+        where += (" AND " if where else " WHERE ") + "h.title_key IS NULL"
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT DISTINCT g.name FROM games g "
+                "LEFT JOIN hltb_times h ON g.title_key = h.title_key" + where, args).fetchall()
+        return sorted(row[0] for row in rows)
@@ -0,0 +1,86 @@
+import json
+import os
+from collections import Counter, namedtuple
+from urllib.parse import quote
+
+from .backloggery import Backloggery, Game, GameStatus
+
+BacklogDiff = namedtuple("BacklogDiff", ["added", "removed", "status_changed"])
+
+
+class SnapshotStore:
+    """
+    Keeps the last seen list of games for each user as json files in `directory`
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, username):
+        return os.path.join(self.directory, quote(username, safe="") + ".json")
+
+    def load(self, username):
+        try:
+            with open(self._path(username)) as f:
+                rows = json.load(f)
+        except FileNotFoundError:
+            return None
+        return [Game(name, platform, GameStatus(status)) for name, platform, status in rows]
+
+    def save(self, username, games):
+        path = self._path(username)
+        rows = [[game.name, game.platform, game.status.value] for game in games]
+        with open(path + ".tmp", "w") as f:
+            json.dump(rows, f)
+        os.replace(path + ".tmp", path)
+
+
+def _expand(counter):
+    return [Game(name, platform, status)
+            for (name, platform, status), count in sorted(counter.items(), key=str)
+            for _ in range(count)]
+
+
+def diff_games(old_games, new_games):
+    """
+    Compares two lists of games
+
+    A game whose name and platform are in both lists but with a different
+    status is reported in status_changed as an (old, new) pair instead of
+    in added and removed
+    """
+    old_counts = Counter((game.name, game.platform, game.status) for game in old_games)
+    new_counts = Counter((game.name, game.platform, game.status) for game in new_games)
+    added = _expand(new_counts - old_counts)
+    removed = _expand(old_counts - new_counts)
+    status_changed = []
+    for new_game in list(added):
+        for old_game in removed:
+            if (old_game.name, old_game.platform) == (new_game.name, new_game.platform):
+                status_changed.append((old_game, new_game))
+                added.remove(new_game)
+                removed.remove(old_game)
+                break
+    return BacklogDiff(added, removed, status_changed)
+
+
+class BacklogSync:
+    """
+    Fetches a user's games and reports what changed since the previous sync
+
+    Backloggery has no way to ask for recently changed games and lists them
+    sorted by system and name, so a change can be on any page. Every sync
+    therefore fetches the whole list, using `workers` concurrent requests.
+    """
+    def __init__(self, username, store, backloggery=None, workers=4):
+        self.username = username
+        self.store = store
+        self.backloggery = backloggery if backloggery is not None else Backloggery(username)
+        self.workers = workers
+
+    def sync(self):
+        games = self.backloggery.find(workers=self.workers)
+        previous = self.store.load(self.username) or []
+        diff = diff_games(previous, games)
+        self.store.save(self.username, games)
+        return diff
@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from ..backloggery import Game, GameStatus
+from ..errors import SiteError
+
+try:
+    from ..aio import AsyncBackloggery, AsyncHowLongToBeat, AsyncSiteClient
+except ImportError:
+    AsyncBackloggery = None
+
+no_hits_response = "<div class='search_loading'>No results in <u>games</u>, sorry mate.</div>"
+
+
+class StubClient:
+    def __init__(self, responder):
+        self.responder = responder
+        self.calls = []
+
+    async def get(self, url, params):
+        self.calls.append(params)
+        return self.responder(params)
+
+    async def post(self, url, headers, data, params):
+        self.calls.append(data)
+        return self.responder(data)
+
+
+@unittest.skipUnless(AsyncBackloggery, "aiohttp is not installed")
+class AsyncBackloggeryTest(unittest.TestCase):
+    def test_find_multiple_pages(self):
+        client = StubClient(lambda params: params["ajid"])
+        b = AsyncBackloggery("username", client)
+        b.parser = mock.MagicMock()
+        b.parser.parse_page.side_effect = \
+            lambda ajid: [Game("game", "WiiU", GameStatus.beaten)] * (50 if ajid < 100 else 7)
+        games = asyncio.run(b.find(workers=3))
+        self.assertEqual(107, len(games))
+        self.assertEqual([0, 50, 100, 150], [params["ajid"] for params in client.calls])
+        self.assertEqual("username", client.calls[0]["user"])
+
+    def test_status_is_mapped(self):
+        client = StubClient(lambda params: "")
+        b = AsyncBackloggery("username", client)
+        asyncio.run(b.find({"status": GameStatus.unfinished}))
+        self.assertEqual((1, 0), (client.calls[0]["status"], client.calls[0]["unplayed"]))
+
+    def test_no_sync_session_is_made(self):
+        client = StubClient(lambda params: "")
+        with mock.patch("game_site_tools.backloggery.default_session") as default_session:
+            asyncio.run(AsyncBackloggery("username", client).find())
+        default_session.assert_not_called()
+
+
+@unittest.skipUnless(AsyncBackloggery, "aiohttp is not installed")
+class AsyncHowLongToBeatTest(unittest.TestCase):
+    def test_should_try_roman_if_no_value(self):
+        client = StubClient(lambda data: no_hits_response)
+        h = AsyncHowLongToBeat(client)
+        self.assertIsNone(asyncio.run(h.find("Gabriel Knight 2")))
+        self.assertEqual(["Gabriel Knight 2", "Gabriel Knight II"],
+                         [data["queryString"] for data in client.calls])
+
+    def test_find_many_reports_failures(self):
+        def responder(data):
+            if data["queryString"] == "Loom":
+                raise ValueError("boom")
+            return no_hits_response
+        h = AsyncHowLongToBeat(StubClient(responder))
+        results = asyncio.run(h.find_many(["Zork", "Loom"]))
+        self.assertEqual(["Zork", "Loom"], [result.name for result in results])
+        self.assertIsNone(results[0].error)
+        self.assertIsInstance(results[1].error, ValueError)
+
+
+@unittest.skipUnless(AsyncBackloggery, "aiohttp is not installed")
+class AsyncSiteClientTest(unittest.TestCase):
+    def test_limits_concurrency(self):
+        active = []
+        peak = []
+
+        class Response:
+            status = 200
+
+            async def __aenter__(self):
+                active.append(1)
+                peak.append(len(active))
+                await asyncio.sleep(0.01)
+                return self
+
+            async def __aexit__(self, *exc_info):
+                active.pop()
+
+            async def read(self):
+                return b""
+
+        async def run():
+            session = mock.MagicMock()
+            session.get.side_effect = lambda url, params: Response()
+            client = AsyncSiteClient(session, max_concurrency=2)
+            await asyncio.gather(*[client.get("http://site", {}) for _ in range(6)])
+
+        asyncio.run(run())
+        self.assertEqual(2, max(peak))
+
+    def test_error_status_raises(self):
+        class Response:
+            status = 503
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc_info):
+                pass
+
+            async def read(self):
+                return no_hits_response
+
+        async def run():
+            session = mock.MagicMock()
+            session.post.side_effect = lambda url, headers, data, params: Response()
+            client = AsyncSiteClient(session)
+            return await client.post("http://site", {}, {}, {})
+
+        with self.assertRaises(SiteError) as e:
+            asyncio.run(run())
+        self.assertEqual(503, e.exception.status)
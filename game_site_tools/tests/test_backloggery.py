@@ -1,9 +1,15 @@
+import pickle
+import threading
+import time
 import unittest
 from unittest import mock
 from copy import deepcopy
 
-from ..backloggery import Game, GameStatus
+from ..backloggery import Game, GameStatus, GameTable
 from ..backloggery import GamePageParser, SiteApi, Backloggery
+from ..cache import MemoryCache
+from ..errors import SiteError
+from ..throttle import HostThrottle, ThrottleSettings
 
 
 class CopyingMock(mock.MagicMock):
@@ -21,12 +27,14 @@ class CopyingMock(mock.MagicMock):
 
 
 class GamePageParserTest(unittest.TestCase):
+    backend = None
+
     def test_parse_empty_page(self):
-        parser = GamePageParser()
+        parser = GamePageParser(self.backend)
         self.assertEqual([], parser.parse_page(""))
 
     def test_parse_regular_snippet(self):
-        parser = GamePageParser()
+        parser = GamePageParser(self.backend)
         page = """
         <section class="gamebox">
             <h2>
@@ -42,7 +50,7 @@ class GamePageParserTest(unittest.TestCase):
         self.assertEqual(expected, parser.parse_page(page))
 
     def test_parse_game_status_unplayed(self):
-        parser = GamePageParser()
+        parser = GamePageParser(self.backend)
         page = """
         <section class="gamebox">
             <h2>
@@ -58,7 +66,7 @@ class GamePageParserTest(unittest.TestCase):
         self.assertEqual(expected, parser.parse_page(page))
 
     def test_parse_game_status_unfinished(self):
-        parser = GamePageParser()
+        parser = GamePageParser(self.backend)
         page = """
         <section class="gamebox">
             <h2>
@@ -74,7 +82,7 @@ class GamePageParserTest(unittest.TestCase):
         self.assertEqual(expected, parser.parse_page(page))
 
     def test_parse_game_status_completed(self):
-        parser = GamePageParser()
+        parser = GamePageParser(self.backend)
         page = """
         <section class="gamebox">
             <h2>
@@ -90,7 +98,7 @@ class GamePageParserTest(unittest.TestCase):
         self.assertEqual(expected, parser.parse_page(page))
 
     def test_parse_game_now_playing(self):
-        parser = GamePageParser()
+        parser = GamePageParser(self.backend)
         page = """
         <section class="gamebox nowplaying">
             <img class="npimage" src="images/SP_np.gif" />
@@ -106,8 +114,24 @@ class GamePageParserTest(unittest.TestCase):
         expected = [Game("Broken Sword 5", "iPad", GameStatus.unfinished)]
         self.assertEqual(expected, parser.parse_page(page))
 
+    def test_parse_encoded_page(self):
+        parser = GamePageParser(self.backend)
+        page = """
+        <section class="gamebox">
+            <h2>
+                <a href="games.php?user=username&amp;console=PC&amp;status=2">
+                    <img alt="(B)" width="16" height="16" src="images/beaten.gif" />
+                </a>
+                <b>Ōkami &amp; Pokémon</b>
+            </h2>
+            <div class="gamerow"><b>PC</b></div>
+        </section>
+        """.encode("utf-8")
+        expected = [Game("Ōkami & Pokémon", "PC", GameStatus.beaten)]
+        self.assertEqual(expected, parser.parse_page(page))
+
     def test_parse_multiple_games(self):
-        parser = GamePageParser()
+        parser = GamePageParser(self.backend)
         page = """
         <section class="system title shadow">Nintendo 3DS</section>
             <section class="gamebox">
@@ -135,6 +159,22 @@ class GamePageParserTest(unittest.TestCase):
                     Game("Luigi's Mansion: Dark Moon", "3DS", GameStatus.beaten)]
         self.assertEqual(expected, parser.parse_page(page))
 
+    def test_parse_total(self):
+        parser = GamePageParser(self.backend)
+        page = """
+        <a href="ajax_moregames.php?user=username&amp;total=734&amp;aid=2&amp;ajid=50">more</a>
+        """
+        self.assertEqual(734, parser.parse_total(page))
+        self.assertEqual(734, parser.parse_total(page.encode("utf-8")))
+
+    def test_parse_total_missing(self):
+        parser = GamePageParser(self.backend)
+        self.assertIsNone(parser.parse_total(""))
+
+
+class SoupGamePageParserTest(GamePageParserTest):
+    backend = "html.parser"
+
 
 class Contains:
     """
@@ -157,7 +197,7 @@ class Contains:
         return "<Contains: " + str(self.sub_dict) + ">"
 
 
-@mock.patch("requests.get")
+@mock.patch("requests.Session.get")
 class SiteApiTest(unittest.TestCase):
     def test_default_page_request(self, mock_request):
         api = SiteApi("username")
@@ -225,12 +265,28 @@ class SiteApiTest(unittest.TestCase):
             "status": 5,
             "unplayed": ""}))
 
+    def test_cached_page_is_not_fetched(self, mock_request):
+        api = SiteApi("username", cache=MemoryCache())
+        mock_request.return_value.content = b"page"
+        self.assertEqual(b"page", api.get_page({"search": "zelda"}))
+        self.assertEqual(b"page", api.get_page({"search": "zelda"}))
+        self.assertEqual(1, mock_request.call_count)
+
+    def test_error_status_raises(self, mock_request):
+        api = SiteApi("username", throttle=HostThrottle(ThrottleSettings(retries=0)))
+        mock_request.return_value.ok = False
+        mock_request.return_value.status_code = 500
+        with self.assertRaises(SiteError) as e:
+            api.get_page()
+        self.assertEqual(500, e.exception.status)
+
 
 class BackloggeryTest(unittest.TestCase):
     def setUp(self):
         self.b = Backloggery("username")
         self.b.api = CopyingMock()
         self.b.parser = mock.MagicMock()
+        self.b.parser.parse_total.return_value = None
 
     def test_find_empty_page(self):
         self.b.parser.parse_page.return_value = []
@@ -259,3 +315,171 @@ class BackloggeryTest(unittest.TestCase):
         self.b.parser.parse_page.return_value = [Game("game", "WiiU", GameStatus.beaten)]
         self.b.find({"search": "zelda"})
         self.b.api.get_page.assert_called_with(Contains({"search": "zelda"}))
+
+    def test_find_concurrent_matches_sequential(self):
+        pages = {
+            0: [Game("game", "WiiU", GameStatus.beaten)] * 50,
+            50: [Game("game", "3DS", GameStatus.unplayed)] * 50,
+            100: [Game("game", "PC", GameStatus.completed)] * 3,
+        }
+        self.b.api.get_page.side_effect = lambda params: params["ajid"]
+        self.b.parser.parse_page.side_effect = lambda ajid: pages.get(ajid, [])
+        sequential = self.b.find()
+        concurrent = self.b.find(workers=4)
+        self.assertEqual(sequential, concurrent)
+        self.assertEqual(103, len(concurrent))
+
+    def test_find_concurrent_stops_at_short_page(self):
+        self.b.api.get_page.side_effect = lambda params: params["ajid"]
+        self.b.parser.parse_page.side_effect = \
+            lambda ajid: [Game("game", "WiiU", GameStatus.beaten)] * (50 if ajid < 100 else 0)
+        games = self.b.find(workers=2)
+        self.assertEqual(100, len(games))
+        self.assertEqual(3, self.b.api.get_page.call_count)
+
+    def test_iter_games_yields_before_next_page(self):
+        self.b.parser.parse_page.side_effect = [
+            [Game("game", "WiiU", GameStatus.beaten)] * 50,
+            [Game("game", "3DS", GameStatus.beaten)],
+        ]
+        games = self.b.iter_games()
+        self.assertEqual(Game("game", "WiiU", GameStatus.beaten), next(games))
+        self.assertEqual(1, self.b.api.get_page.call_count)
+        self.assertEqual(50, len(list(games)))
+        self.assertEqual(2, self.b.api.get_page.call_count)
+
+    def test_find_filter_is_mapped_to_param(self):
+        self.b.parser.parse_page.return_value = []
+        self.b.find(platform="3DS")
+        self.b.api.get_page.assert_called_with({"ajid": 0, "console": "3DS"})
+
+    def test_find_unknown_filter(self):
+        with self.assertRaises(TypeError):
+            self.b.find(genre="rpg")
+
+    def test_find_multiple_filter_values_are_merged(self):
+        pages = {
+            GameStatus.unplayed: [Game("Loom", "PC", GameStatus.unplayed),
+                                  Game("Zork", "PC", GameStatus.unplayed)],
+            GameStatus.unfinished: [Game("Myst", "PC", GameStatus.unfinished)],
+        }
+        self.b.api.get_page.side_effect = lambda params: params["status"]
+        self.b.parser.parse_page.side_effect = lambda status: pages[status]
+        games = self.b.find(status=[GameStatus.unplayed, GameStatus.unfinished])
+        self.assertEqual(pages[GameStatus.unplayed] + pages[GameStatus.unfinished], games)
+        self.b.api.get_page.assert_has_calls([
+            mock.call({"ajid": 0, "status": GameStatus.unplayed}),
+            mock.call({"ajid": 0, "status": GameStatus.unfinished}),
+        ], any_order=True)
+
+    def test_find_limits_parallel_queries(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def get_page(params):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.pop()
+        self.b.MAX_PARALLEL_QUERIES = 3
+        self.b.api.get_page.side_effect = get_page
+        self.b.parser.parse_page.return_value = []
+        self.b.find(platform=["PC", "PS2", "3DS", "DS", "Wii", "GBA"],
+                    status=[GameStatus.unplayed, GameStatus.unfinished])
+        self.assertEqual(12, self.b.api.get_page.call_count)
+        self.assertLessEqual(max(peak), 3)
+
+    def test_find_with_no_filter_values(self):
+        self.assertEqual([], self.b.find(status=[]))
+        self.b.api.get_page.assert_not_called()
+
+    def test_find_repeated_filter_values_query_once(self):
+        self.b.parser.parse_page.return_value = []
+        self.b.find(platform=["PC", "PC"])
+        self.b.api.get_page.assert_called_once_with({"ajid": 0, "console": "PC"})
+
+    def test_find_removes_games_returned_by_several_queries(self):
+        self.b.parser.parse_page.return_value = [Game("Loom", "PC", GameStatus.beaten)]
+        games = self.b.find(platform=["PC", "PC"])
+        self.assertEqual([Game("Loom", "PC", GameStatus.beaten)], games)
+
+    def test_find_plans_pages_from_total(self):
+        self.b.api.get_page.side_effect = lambda params: params["ajid"]
+        self.b.parser.parse_total.return_value = 130
+        self.b.parser.parse_page.side_effect = \
+            lambda ajid: [Game("game", "WiiU", GameStatus.beaten)] * (50 if ajid < 100 else 30)
+        games = self.b.find(workers=4)
+        self.assertEqual(130, len(games))
+        self.assertEqual([mock.call({"ajid": 0}), mock.call({"ajid": 50}), mock.call({"ajid": 100})],
+                         self.b.api.get_page.call_args_list)
+
+    def test_find_trusts_exact_total(self):
+        self.b.api.get_page.side_effect = lambda params: params["ajid"]
+        self.b.parser.parse_total.return_value = 150
+        self.b.parser.parse_page.side_effect = \
+            lambda ajid: [Game("game", "WiiU", GameStatus.beaten)] * max(0, min(50, 150 - ajid))
+        for workers in (1, 4):
+            self.b.api.get_page.reset_mock()
+            self.assertEqual(150, len(self.b.find(workers=workers)))
+            self.assertEqual(3, self.b.api.get_page.call_count)
+
+    def test_find_probes_when_total_is_not_past_first_page(self):
+        self.b.api.get_page.side_effect = lambda params: params["ajid"]
+        self.b.parser.parse_total.return_value = 50
+        self.b.parser.parse_page.side_effect = \
+            lambda ajid: [Game("game", "WiiU", GameStatus.beaten)] * max(0, min(50, 120 - ajid))
+        for workers in (1, 4):
+            self.assertEqual(120, len(self.b.find(workers=workers)))
+
+    def test_find_uses_page_size_of_first_page(self):
+        self.b.api.get_page.side_effect = lambda params: params["ajid"]
+        self.b.parser.parse_page.side_effect = \
+            lambda ajid: [Game("game", "WiiU", GameStatus.beaten)] * (100 if ajid == 0 else 30)
+        games = self.b.find()
+        self.assertEqual(130, len(games))
+        self.b.api.get_page.assert_called_with({"ajid": 100})
+
+
+class GameTest(unittest.TestCase):
+    def test_equal_games_have_same_hash(self):
+        self.assertEqual(hash(Game("Loom", "PC", GameStatus.beaten)),
+                         hash(Game("Loom", "PC", GameStatus.beaten)))
+
+    def test_games_can_be_deduplicated_in_a_set(self):
+        games = {Game("Loom", "PC", GameStatus.beaten),
+                 Game("Loom", "PC", GameStatus.beaten),
+                 Game("Loom", "PC", GameStatus.unplayed)}
+        self.assertEqual(2, len(games))
+
+    def test_intern_returns_same_object(self):
+        game = Game.intern("Loom", "PC", GameStatus.beaten)
+        self.assertIs(game, Game.intern("Loom", "PC", GameStatus.beaten))
+
+    def test_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            Game("Loom", "PC", GameStatus.beaten).__dict__
+
+    def test_immutable(self):
+        game = Game.intern("Loom", "PC", GameStatus.beaten)
+        with self.assertRaises(AttributeError):
+            game.status = GameStatus.unplayed
+        self.assertEqual(GameStatus.beaten, Game.intern("Loom", "PC", GameStatus.beaten).status)
+
+    def test_pickle(self):
+        game = Game("Loom", "PC", GameStatus.beaten)
+        self.assertEqual(game, pickle.loads(pickle.dumps(game)))
+
+    def test_repr(self):
+        self.assertEqual("<Loom (PC): GameStatus.beaten>", repr(Game("Loom", "PC", GameStatus.beaten)))
+
+
+class GameTableTest(unittest.TestCase):
+    def test_round_trip(self):
+        games = [Game("Loom", "PC", GameStatus.beaten), Game("Zork", "DOS", GameStatus.null)]
+        table = GameTable(games)
+        self.assertEqual(2, len(table))
+        self.assertEqual(games, list(table))
+        self.assertEqual(games[1], table[1])
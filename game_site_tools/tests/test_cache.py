@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from ..cache import make_key, MemoryCache, SqliteCache, TieredCache
+
+
+class MakeKeyTest(unittest.TestCase):
+    def test_key_ignores_param_order(self):
+        self.assertEqual(make_key("http://site", {"a": 1, "b": 2}),
+                         make_key("http://site", {"b": 2, "a": 1}))
+
+    def test_key_depends_on_params(self):
+        self.assertNotEqual(make_key("http://site", {"a": 1}),
+                            make_key("http://site", {"a": 2}))
+
+
+class MemoryCacheTest(unittest.TestCase):
+    def test_get_after_set(self):
+        cache = MemoryCache()
+        cache.set("key", b"value", 60)
+        self.assertEqual(b"value", cache.get("key"))
+
+    def test_delete(self):
+        cache = MemoryCache()
+        cache.set("key", b"value", 60)
+        cache.delete("key")
+        self.assertIsNone(cache.get("key"))
+
+    def test_hit_and_miss_counters(self):
+        cache = MemoryCache()
+        cache.get("key")
+        cache.set("key", b"value", 60)
+        cache.get("key")
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        self.assertEqual(0.5, cache.hit_ratio)
+
+    def test_expired_entry_is_a_miss(self):
+        cache = MemoryCache()
+        with mock.patch("time.time", return_value=100):
+            cache.set("key", b"value", 60)
+        with mock.patch("time.time", return_value=161):
+            self.assertIsNone(cache.get("key"))
+        self.assertEqual(0, len(cache))
+
+    def test_evicts_least_recently_used(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", b"a", 60)
+        cache.set("b", b"b", 60)
+        cache.get("a")
+        cache.set("c", b"c", 60)
+        self.assertEqual(b"a", cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+
+
+class SqliteCacheTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_persists_between_instances(self):
+        cache = SqliteCache(self.path)
+        cache.set("key", b"value", 60)
+        cache.close()
+        cache = SqliteCache(self.path)
+        self.assertEqual(b"value", cache.get("key"))
+        cache.close()
+
+    def test_evicts_least_recently_used(self):
+        cache = SqliteCache(self.path, max_entries=2)
+        with mock.patch("time.time", side_effect=range(1, 100)):
+            cache.set("a", b"a", 60)
+            cache.set("b", b"b", 60)
+            cache.get("a")
+            cache.set("c", b"c", 60)
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get("b"))
+        cache.close()
+
+
+class TieredCacheTest(unittest.TestCase):
+    def test_hit_in_slow_tier_fills_fast_tier(self):
+        fast, slow = MemoryCache(), MemoryCache()
+        cache = TieredCache(fast, slow)
+        slow.set("key", b"value", 60)
+        self.assertEqual(b"value", cache.get("key"))
+        self.assertEqual(b"value", fast.get("key"))
+
+    def test_set_writes_all_tiers(self):
+        fast, slow = MemoryCache(), MemoryCache()
+        TieredCache(fast, slow).set("key", b"value", 60)
+        self.assertEqual(b"value", fast.get("key"))
+        self.assertEqual(b"value", slow.get("key"))
@@ -0,0 +1,96 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from ..coalesce import SingleFlight
+from ..howlongtobeat import SiteApi
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    # Give every thread time to join the in-flight call
+    time.sleep(0.1)
+    return threads
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        fn = mock.MagicMock(side_effect=lambda: release.wait() and "result")
+        results = []
+        threads = run_threads(5, lambda: results.append(flight.do("key", fn)))
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(["result"] * 5, results)
+        self.assertEqual(1, fn.call_count)
+        self.assertEqual({}, flight.calls)
+
+    def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight()
+        fn = mock.MagicMock(return_value="result")
+        flight.do("key", fn)
+        flight.do("key", fn)
+        self.assertEqual(2, fn.call_count)
+
+    def test_waiters_get_the_exception(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            started.set()
+            release.wait()
+            raise ValueError("boom")
+
+        errors = []
+
+        def waiter():
+            try:
+                flight.do("key", lambda: "not called")
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=lambda: self.assertRaises(ValueError, flight.do, "key", fail))
+        leader.start()
+        started.wait()
+        threads = run_threads(3, waiter)
+        release.set()
+        for thread in [leader] + threads:
+            thread.join()
+        self.assertEqual(3, len(errors))
+
+
+class SiteApiCoalescingTest(unittest.TestCase):
+    def test_identical_queries_share_one_request(self):
+        release = threading.Event()
+        session = mock.MagicMock()
+        session.post.side_effect = lambda *args, **kwargs: release.wait() and mock.MagicMock(content=b"page")
+        api = SiteApi(session=session)
+        results = []
+        threads = run_threads(4, lambda: results.append(api.get_page("Portal 2")))
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([b"page"] * 4, results)
+        self.assertEqual(1, session.post.call_count)
+
+    def test_different_sessions_do_not_share(self):
+        release = threading.Event()
+        sessions = [mock.MagicMock(), mock.MagicMock()]
+        for session in sessions:
+            session.post.side_effect = \
+                lambda *args, **kwargs: release.wait() and mock.MagicMock(content=b"page")
+        apis = [SiteApi(session=session) for session in sessions]
+        threads = [threading.Thread(target=api.get_page, args=("Portal 2",)) for api in apis]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([1, 1], [session.post.call_count for session in sessions])
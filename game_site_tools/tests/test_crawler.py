@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..backloggery import Backloggery, Game, GameStatus
+from ..crawler import BulkCrawler, CrawlCheckpoint
+
+
+class StubBackloggery(Backloggery):
+    """
+    Serves `library_sizes[username]` games for each user and logs the requests
+    """
+    def __init__(self, username, library_sizes, log, fail_at=None, page_size=None):
+        self.username = username
+        self.page_size = page_size if page_size is not None else self.NUM_PAGE_RESULTS
+        self.library_sizes = library_sizes
+        self.log = log
+        self.fail_at = fail_at
+
+    def _find_page(self, params):
+        offset = params["ajid"]
+        self.log.append((self.username, offset))
+        if self.fail_at == (self.username, offset):
+            raise ValueError("boom")
+        count = max(0, min(self.page_size, self.library_sizes[self.username] - offset))
+        return [Game("{} {}".format(self.username, offset + i), "PC", GameStatus.beaten)
+                for i in range(count)]
+
+
+class BulkCrawlerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.directory, "crawl.json")
+        self.sizes = {"alice": 120, "bob": 10, "carol": 50}
+        self.log = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def crawler(self, fail_at=None, page_size=None, **kwargs):
+        return BulkCrawler(self.sizes, backloggery_factory=lambda username: StubBackloggery(
+            username, self.sizes, self.log, fail_at, page_size), **kwargs)
+
+    def test_fetches_every_user(self):
+        crawler = self.crawler(workers=1)
+        self.assertEqual({}, crawler.run())
+        self.assertEqual({"alice": 120, "bob": 10, "carol": 50},
+                         {username: len(games) for username, games in crawler.results.items()})
+        self.assertEqual("alice 119", crawler.results["alice"][-1].name)
+
+    def test_users_take_turns(self):
+        self.crawler(workers=1).run()
+        self.assertEqual([("alice", 0), ("bob", 0), ("carol", 0), ("alice", 50),
+                          ("carol", 50), ("alice", 100)], self.log)
+
+    def test_page_size_is_learned(self):
+        self.sizes = {"alice": 250}
+        crawler = self.crawler(workers=1, page_size=100)
+        crawler.run()
+        self.assertEqual([("alice", 0), ("alice", 100), ("alice", 200)], self.log)
+        self.assertEqual(250, len(crawler.results["alice"]))
+
+    def test_checkpoint_requires_on_user_done(self):
+        with self.assertRaises(ValueError):
+            self.crawler(checkpoint=self.checkpoint)
+
+    def test_resume_from_checkpoint(self):
+        failed = self.crawler(fail_at=("alice", 100), workers=1, checkpoint=self.checkpoint,
+                              on_user_done={}.__setitem__).run()
+        self.assertEqual(["alice"], list(failed))
+        checkpoint = CrawlCheckpoint(self.checkpoint)
+        self.assertEqual({"bob", "carol"}, checkpoint.done)
+        self.assertEqual(100, checkpoint.partial["alice"][0])
+
+        self.log.clear()
+        done = {}
+        crawler = self.crawler(workers=1, checkpoint=self.checkpoint, on_user_done=done.__setitem__)
+        self.assertEqual({}, crawler.run())
+        self.assertEqual([("alice", 100)], self.log)
+        self.assertEqual(120, len(done["alice"]))
+
+    def test_checkpoint_ignores_interrupted_write(self):
+        checkpoint = CrawlCheckpoint(self.checkpoint)
+        checkpoint.add_page("alice", 0, [Game("Loom", "PC", GameStatus.beaten)])
+        checkpoint.finish("bob")
+        with open(self.checkpoint, "a") as f:
+            f.write('{"user": "alice", "offset": 1, "ga')
+        checkpoint = CrawlCheckpoint(self.checkpoint)
+        self.assertEqual({"bob"}, checkpoint.done)
+        self.assertEqual((1, [Game("Loom", "PC", GameStatus.beaten)]), checkpoint.partial["alice"])
@@ -1,7 +1,10 @@
 import unittest
 from unittest import mock
 
-from ..howlongtobeat import GamePageParser, SiteApi, HowLongToBeat
+from ..howlongtobeat import GamePageParser, SiteApi, HowLongToBeat, HltbEntry
+from ..cache import MemoryCache
+from ..throttle import HostThrottle, ThrottleSettings
+from ..titles import TitleIndex
 
 single_hit_response = """
 <li>
@@ -44,83 +47,55 @@ single_hit_response = """
 """
 
 fractional_hours_response = """
-<li>
-    <div class='gamelist_image back_black shadow_box'>
-        <a title='Space Quest III: The Pirates of Pestulon' href='game.php?id=8865'>
-            <img style='width:100%;'
-              src='http://howlongtobeat.com/gameimages/256px-Spacequest3.jpg' />
-        </a>
-    </div>
-    <div class='gamelist_details shadow_box back_darkish'>
-        <h3 class='' style=''>
-            <a class='text_yellow' title='Space Quest III: The Pirates of Pestulon'
-              href='game.php?id=8865'>Space Quest III: The Pirates of Pestulon</a>
-        </h3>
-        <div class='back_darkish' style='min-height: 40px;padding: 4px 5px;'>
-            <div style='display:inline-block;'>
-                <div class='gamelist_tidbit'>Main Story</div>
-                <div class='gamelist_tidbit time_40'>2&#189; Hours</div>
-            </div>
-            <div style='display:inline-block;'>
-                <div class='gamelist_tidbit'>Main + Extra</div>
-                <div class='gamelist_tidbit time_00'>N/A</div>
-            </div>
-            <div style='display:inline-block;'>
-                <div class='gamelist_tidbit'>Completionist</div>
-                <div class='gamelist_tidbit time_40'>5 Hours</div>
-            </div>
-            <div style='display:inline-block;'>
-                <div class='gamelist_tidbit'>Combined</div>
-                <div class='gamelist_tidbit time_40'>3&#189; Hours</div>
-            </div>
+<ul>
+    <li class="back_darkish">
+        <div class="search_list_image">
+            <a aria-label="Space Quest III The Pirates of Pestulon"
+              title="Space Quest III: The Pirates of Pestulon" href="game?id=8865">
+                <img alt="Box Art" src="https://howlongtobeat.com/games/256px-Spacequest3.jpg" />
+            </a>
         </div>
-        <div class='back_dark'>
-            <strong class='gamelist_tidbit text_white'>Submit:</strong>
-            <a class='gamelist_tidbit text_white' title='Submit Your Time'
-              href='submit_add.php?gid=8865'>+ Your Time</a>
+        <div class="search_list_details">
+            <h3 class="shadow_text">
+                <a class="text_white" title="Space Quest III: The Pirates of Pestulon"
+                  href="game?id=8865">Space Quest III: The Pirates of Pestulon</a>
+            </h3>
+            <div class="search_list_details_block">
+                <div>
+                    <div class="search_list_tidbit text_white shadow_text">Main Story</div>
+                    <div class="search_list_tidbit center time_40">2&#189; Hours </div>
+                    <div class="search_list_tidbit text_white shadow_text">Main + Extra</div>
+                    <div class="search_list_tidbit center time_00">--</div>
+                    <div class="search_list_tidbit text_white shadow_text">Completionist</div>
+                    <div class="search_list_tidbit center time_40">5 Hours </div>
+                </div>
+            </div>
         </div>
-    </div>
-</li>
+    </li>
+</ul>
 """
 
 no_hours_available_response = """
-<li>
-    <div class='gamelist_image back_black shadow_box'>
-        <a title='A Mind Forever Voyaging' href='game.php?id=132'>
-            <img style='width:100%;'
-              src='http://howlongtobeat.com/gameimages/A_Mind_Forever_Voyaging_Coverart.png' />
-        </a>
-    </div>
-    <div class='gamelist_details shadow_box back_darkish'>
-        <h3 class='' style=''>
-            <a class='text_yellow' title='A Mind Forever Voyaging'
-              href='game.php?id=132'>A Mind Forever Voyaging</a>
-        </h3>
-        <div class='back_darkish' style='min-height: 40px;padding: 4px 5px;'>
-            <div style='display:inline-block;'>
-                <div class='gamelist_tidbit'>Main Story</div>
-                <div class='gamelist_tidbit time_00'>N/A</div>
-            </div>
-            <div style='display:inline-block;'>
-                <div class='gamelist_tidbit'>Main + Extra</div>
-                <div class='gamelist_tidbit time_00'>N/A</div>
-            </div>
-            <div style='display:inline-block;'>
-                <div class='gamelist_tidbit'>Completionist</div>
-                <div class='gamelist_tidbit time_00'>N/A</div>
-            </div>
-            <div style='display:inline-block;'>
-                <div class='gamelist_tidbit'>Combined</div>
-                <div class='gamelist_tidbit time_00'>N/A</div>
+<ul>
+    <li class="back_darkish">
+        <div class="search_list_details">
+            <h3 class="shadow_text">
+                <a class="text_white" title="A Mind Forever Voyaging"
+                  href="game?id=132">A Mind Forever Voyaging</a>
+            </h3>
+            <div class="search_list_details_block">
+                <div>
+                    <div class="search_list_tidbit text_white shadow_text">Main Story</div>
+                    <div class="search_list_tidbit center time_00">--</div>
+                    <div class="search_list_tidbit text_white shadow_text">Main + Extra</div>
+                    <div class="search_list_tidbit center time_00">--</div>
+                    <div class="search_list_tidbit text_white shadow_text">Completionist</div>
+                    <div class="search_list_tidbit center time_00">--</div>
+                </div>
             </div>
         </div>
-        <div class='back_dark'>
-            <strong class='gamelist_tidbit text_white'>Submit:</strong>
-            <a class='gamelist_tidbit text_white' title='Submit Your Time'
-              href='submit_add.php?gid=132'>+ Your Time</a>
-        </div>
-    </div>
-</li>
+    </li>
+</ul>
 """
 
 no_hits_response = """
@@ -212,36 +187,125 @@ multiple_hits_response = """
 <div class='clear'></div>
 """
 
+search_list_response = """
+<ul>
+    <li class="back_darkish">
+        <div class="search_list_image">
+            <a aria-label="Baldurs Gate" title="Baldur's Gate" href="game?id=808">
+                <img alt="Box Art" src="https://howlongtobeat.com/games/Baldurs_Gate_box.PNG" />
+            </a>
+        </div>
+        <div class="search_list_details">
+            <h3 class="shadow_text">
+                <a class="text_white" title="Baldur's Gate" href="game?id=808">Baldur's Gate</a>
+            </h3>
+            <div class="search_list_details_block">
+                <div>
+                    <div class="search_list_tidbit text_white shadow_text">Main Story</div>
+                    <div class="search_list_tidbit center time_100">45 Hours </div>
+                    <div class="search_list_tidbit text_white shadow_text">Main + Extra</div>
+                    <div class="search_list_tidbit center time_100">56&#189; Hours </div>
+                    <div class="search_list_tidbit text_white shadow_text">Completionist</div>
+                    <div class="search_list_tidbit center time_100">107 Hours </div>
+                </div>
+            </div>
+        </div>
+    </li>
+    <li class="back_darkish">
+        <div class="search_list_details">
+            <h3 class="shadow_text">
+                <a class="text_white" title="Baldur's Gate: Tales of the Sword Coast"
+                  href="game?id=810">Baldur's Gate: Tales of the Sword Coast</a>
+            </h3>
+            <div class="search_list_details_block">
+                <div>
+                    <div class="search_list_tidbit text_white shadow_text">Main Story</div>
+                    <div class="search_list_tidbit center time_40">45 Mins </div>
+                    <div class="search_list_tidbit text_white shadow_text">Main + Extra</div>
+                    <div class="search_list_tidbit center time_00">--</div>
+                    <div class="search_list_tidbit text_white shadow_text">Completionist</div>
+                    <div class="search_list_tidbit center time_40">12&#189; Hours </div>
+                </div>
+            </div>
+        </div>
+    </li>
+</ul>
+"""
+
+gabriel_knight_response = """
+<ul>
+    <li class="back_darkish">
+        <div class="search_list_details">
+            <h3 class="shadow_text">
+                <a class="text_white" title="Gabriel Knight II: The Beast Within"
+                  href="game?id=3782">Gabriel Knight II: The Beast Within</a>
+            </h3>
+            <div class="search_list_details_block">
+                <div>
+                    <div class="search_list_tidbit text_white shadow_text">Main Story</div>
+                    <div class="search_list_tidbit center time_50">14 Hours </div>
+                    <div class="search_list_tidbit text_white shadow_text">Main + Extra</div>
+                    <div class="search_list_tidbit center time_40">15 Hours </div>
+                    <div class="search_list_tidbit text_white shadow_text">Completionist</div>
+                    <div class="search_list_tidbit center time_00">--</div>
+                </div>
+            </div>
+        </div>
+    </li>
+</ul>
+"""
+
 
 class GamePageParserTest(unittest.TestCase):
     def test_parse_regular_result(self):
         parser = GamePageParser()
         self.assertEqual(14, parser.get_story_hours(single_hit_response))
 
-    def test_ignore_fraction_hours(self):
+    def test_keep_fraction_hours(self):
         """
-        We should ignore the fractional amount of hours.
-
         Sometimes the hour contains fractions, eg: 5 1/2 hours.
         """
 
         parser = GamePageParser()
-        self.assertEqual(2, parser.get_story_hours(fractional_hours_response))
+        self.assertEqual(2.5, parser.get_story_hours(fractional_hours_response))
+
+    def test_story_hours_same_as_entries(self):
+        parser = GamePageParser()
+        page = search_list_response.replace("45 Hours", "45 Mins")
+        self.assertEqual(0.75, parser.get_story_hours(page))
+        self.assertEqual(parser.get_entries(page)[0].main, parser.get_story_hours(page))
 
     def test_should_return_zero_if_no_hours_available(self):
         parser = GamePageParser()
         self.assertEqual(0, parser.get_story_hours(no_hours_available_response))
 
-    def test_should_return_zero_if_no_hits(self):
+    def test_should_return_none_if_no_hits(self):
         parser = GamePageParser()
-        self.assertEqual(0, parser.get_story_hours(no_hits_response))
+        self.assertIsNone(parser.get_story_hours(no_hits_response))
 
     def test_should_return_first_of_multiple_hits(self):
         parser = GamePageParser()
         self.assertEqual(45, parser.get_story_hours(multiple_hits_response))
 
+    def test_get_entries_for_every_hit(self):
+        parser = GamePageParser()
+        expected = [
+            HltbEntry(808, "Baldur's Gate", 45, 56.5, 107),
+            HltbEntry(810, "Baldur's Gate: Tales of the Sword Coast", 0.75, None, 12.5),
+        ]
+        self.assertEqual(expected, parser.get_entries(search_list_response))
+
+    def test_get_entries_no_hits(self):
+        parser = GamePageParser()
+        self.assertEqual([], parser.get_entries(no_hits_response))
 
-@mock.patch("requests.post")
+    def test_get_entries_from_encoded_page(self):
+        parser = GamePageParser()
+        entries = parser.get_entries(search_list_response.replace("&#189;", "½").encode("utf-8"))
+        self.assertEqual(56.5, entries[0].main_extra)
+
+
+@mock.patch("requests.Session.post")
 class SiteApiTest(unittest.TestCase):
     def test_page_request(self, mock_request):
         api = SiteApi()
@@ -288,4 +352,112 @@ class HowLongToBeatTest(unittest.TestCase):
         should not attempt again with a roman conversion
         """
         self.h.api.get_page.return_value = no_hits_response
-        self.assertEqual(0, self.h.find("Age of Enigma"))
+        self.assertIsNone(self.h.find("Age of Enigma"))
+        self.h.api.get_page.assert_called_once_with("Age of Enigma")
+
+    def test_find_many_keeps_input_order(self):
+        hours = {"Zork": 5, "Loom": 4, "Myst": 3}
+        self.h.find = mock.MagicMock(side_effect=lambda name: hours[name])
+        results = self.h.find_many(["Zork", "Loom", "Myst"], workers=3)
+        self.assertEqual(["Zork", "Loom", "Myst"], [result.name for result in results])
+        self.assertEqual([5, 4, 3], [result.time for result in results])
+
+    def test_find_many_reports_failures(self):
+        error = ValueError("boom")
+
+        def find(name):
+            if name == "Loom":
+                raise error
+            return 5
+        self.h.find = mock.MagicMock(side_effect=find)
+        results = self.h.find_many(["Zork", "Loom", "Myst"])
+        self.assertEqual([5, None, 5], [result.time for result in results])
+        self.assertEqual([None, error, None], [result.error for result in results])
+
+    def test_find_entries(self):
+        self.h.api.get_page.return_value = search_list_response
+        entries = self.h.find_entries("Baldur's Gate")
+        self.assertEqual([808, 810], [entry.id for entry in entries])
+        self.h.api.get_page.assert_called_once_with("Baldur's Gate")
+
+    def test_find_answered_from_index(self):
+        self.h.index = TitleIndex()
+        self.h.index.add(HltbEntry(3782, "Gabriel Knight II", 14, 15, None))
+        self.assertEqual(14, self.h.find("Gabriel Knight 2"))
+        self.h.api.get_page.assert_not_called()
+
+    def test_index_and_search_give_same_hours(self):
+        self.h.index = TitleIndex()
+        self.h.api.get_page.return_value = search_list_response.replace("45 Hours", "45 Mins")
+        searched = self.h.find("Baldur's Gate")
+        self.assertEqual(searched, self.h.find("Baldurs Gate"))
+        self.assertEqual(0.75, searched)
+        self.h.api.get_page.assert_called_once_with("Baldur's Gate")
+
+    def test_responses_fill_index(self):
+        self.h.index = TitleIndex()
+        self.h.api.get_page.return_value = search_list_response
+        self.h.find("Baldur's Gate")
+        self.assertEqual(808, self.h.index.lookup("Baldurs Gate").id)
+
+    def test_find_tries_variants_of_the_name(self):
+        self.h.api.get_page.side_effect = \
+            lambda game: search_list_response if game == "Baldur's Gate" else no_hits_response
+        self.assertEqual(45, self.h.find("Baldur's Gate (PC)"))
+        self.h.api.get_page.assert_has_calls([mock.call("Baldur's Gate (PC)"),
+                                              mock.call("Baldur's Gate")])
+
+    def test_roman_retry_takes_the_first_hit(self):
+        self.h.api.get_page.side_effect = \
+            lambda game: gabriel_knight_response if game == "Gabriel Knight II" else no_hits_response
+        self.assertEqual(14, self.h.find("Gabriel Knight 2"))
+        self.assertEqual(14, self.h.find("Gabriel Knight 2"))
+
+    def test_variant_matches_hit_without_subtitle(self):
+        self.h.api.get_page.side_effect = \
+            lambda game: gabriel_knight_response if game == "Gabriel Knight II" else no_hits_response
+        self.assertEqual(14, self.h.find("Gabriel Knight II (PC)"))
+
+    def test_variant_needs_a_matching_hit(self):
+        self.h.api.get_page.side_effect = \
+            lambda game: search_list_response if game == "Icewind Dale" else no_hits_response
+        self.assertIsNone(self.h.find("Icewind Dale (PC)"))
+
+    def test_misses_are_not_searched_again(self):
+        self.h.api.get_page.return_value = no_hits_response
+        self.h.find("Icewind Dale: Enhanced Edition")
+        self.h.api.get_page.reset_mock()
+        self.assertIsNone(self.h.find("Icewind Dale: Enhanced Edition"))
+        self.h.api.get_page.assert_not_called()
+
+    def test_misses_expire(self):
+        self.h.miss_ttl = -1
+        self.h.api.get_page.return_value = no_hits_response
+        self.h.find("Age of Enigma")
+        self.h.find("Age of Enigma")
+        self.assertEqual(2, self.h.api.get_page.call_count)
+
+    def test_game_without_time_is_not_a_miss(self):
+        self.h.api.get_page.return_value = search_list_response.replace("45 Hours", "--")
+        self.assertEqual(0, self.h.find("Baldur's Gate"))
+        self.assertEqual(0, self.h.find("Baldur's Gate"))
+        self.assertEqual(2, self.h.api.get_page.call_count)
+
+    def test_misses_in_their_own_cache(self):
+        misses = MemoryCache()
+        h = HowLongToBeat(cache=MemoryCache(), misses=misses, miss_ttl=60)
+        h.api = mock.MagicMock()
+        h.api.url = SiteApi.url
+        h.api.get_page.return_value = no_hits_response
+        h.find("Age of Enigma")
+        self.assertEqual(1, len(misses))
+
+    def test_misses_expire_with_a_page_cache(self):
+        session = mock.MagicMock()
+        session.post.return_value = mock.MagicMock(status_code=200, ok=True,
+                                                   content=no_hits_response.encode("utf-8"))
+        h = HowLongToBeat(cache=MemoryCache(), session=session, miss_ttl=-1,
+                          throttle=HostThrottle(ThrottleSettings(rate=1e9, burst=1e9, max_rate=1e9)))
+        h.find("Age of Enigma")
+        h.find("Age of Enigma")
+        self.assertEqual(2, session.post.call_count)
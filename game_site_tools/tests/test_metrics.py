@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+from ..backloggery import GamePageParser
+from ..metrics import Metrics, MetricsRecorder, StatsdExporter, metrics
+from ..throttle import HostThrottle
+
+
+class MetricsTest(unittest.TestCase):
+    def test_emit_calls_listeners(self):
+        hub = Metrics()
+        listener = hub.subscribe(mock.MagicMock())
+        hub.emit("parse", site="backloggery", rows=3)
+        listener.assert_called_once_with("parse", {"site": "backloggery", "rows": 3})
+        hub.unsubscribe(listener)
+        hub.emit("parse", site="backloggery", rows=3)
+        self.assertEqual(1, listener.call_count)
+
+
+class MetricsRecorderTest(unittest.TestCase):
+    def setUp(self):
+        self.recorder = MetricsRecorder()
+
+    def test_counts_and_sums(self):
+        self.recorder("request", {"site": "hltb", "latency": 0.5, "bytes": 100, "status": 200})
+        self.recorder("request", {"site": "hltb", "latency": 0.25, "bytes": 50, "status": 429})
+        self.assertEqual(2, self.recorder.get("request_total", "hltb"))
+        self.assertEqual(0.75, self.recorder.get("request_latency_sum", "hltb"))
+        self.assertEqual(150, self.recorder.get("request_bytes_sum", "hltb"))
+
+    def test_cache_hit_ratio(self):
+        for hit in [True, True, False, True]:
+            self.recorder("cache", {"site": "hltb", "hit": hit})
+        self.assertEqual(0.75, self.recorder.cache_hit_ratio("hltb"))
+        self.assertEqual(0.0, self.recorder.cache_hit_ratio("backloggery"))
+
+    def test_prometheus(self):
+        self.recorder("request", {"site": "hltb", "status": 200})
+        text = self.recorder.prometheus()
+        self.assertIn("# TYPE game_site_tools_request_total counter\n", text)
+        self.assertIn('game_site_tools_request_total{site="hltb"} 1.0\n', text)
+        self.assertIn('game_site_tools_request_status_total{site="hltb",status="200"} 1.0\n', text)
+
+
+class StatsdExporterTest(unittest.TestCase):
+    def test_format(self):
+        exporter = StatsdExporter()
+        lines = exporter.format("request", {"site": "hltb", "latency": 0.25, "bytes": 100, "status": 200})
+        self.assertEqual("game_site_tools.hltb.request:1|c\n"
+                         "game_site_tools.hltb.request.bytes:100|c\n"
+                         "game_site_tools.hltb.request.latency:250.000|ms", lines)
+
+    def test_send_errors_are_ignored(self):
+        exporter = StatsdExporter()
+        exporter.sock = mock.MagicMock()
+        exporter.sock.sendto.side_effect = OSError
+        exporter("parse", {"site": "hltb", "rows": 1})
+
+
+class InstrumentationTest(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.listener = metrics.subscribe(lambda event, fields: self.events.append((event, fields)))
+
+    def tearDown(self):
+        metrics.unsubscribe(self.listener)
+
+    def test_parse_event(self):
+        GamePageParser().parse_page("")
+        self.assertEqual("parse", self.events[0][0])
+        self.assertEqual(0, self.events[0][1]["rows"])
+
+    def test_request_event(self):
+        response = mock.MagicMock(status_code=200, ok=True, content=b"page")
+        response.raw.retries.history = [1, 2]
+        HostThrottle(host="example.com").send(lambda: response)
+        event, fields = self.events[0]
+        self.assertEqual("request", event)
+        self.assertEqual(("example.com", 4, 200, 2),
+                         (fields["site"], fields["bytes"], fields["status"], fields["retries"]))
@@ -0,0 +1,47 @@
+import unittest
+
+from ..backloggery import Game, GameStatus
+from ..metrics import metrics, MetricsRecorder
+from ..pipeline import fetch_and_parse, parse_backloggery_page
+
+gamebox = """
+<section class="gamebox">
+    <h2>
+        <a href="games.php?user=username&amp;console=PC&amp;status=2">
+            <img alt="(B)" width="16" height="16" src="images/beaten.gif" />
+        </a>
+        <b>{}</b>
+    </h2>
+    <div class="gamerow"><b>PC</b></div>
+</section>
+"""
+
+
+class FetchAndParseTest(unittest.TestCase):
+    def test_results_in_input_order(self):
+        names = ["Game {}".format(i) for i in range(10)]
+        results = list(fetch_and_parse(gamebox.format, names, parse_backloggery_page,
+                                       fetch_workers=4, parse_workers=2, max_pending=3))
+        self.assertEqual(names, [result.item for result in results])
+        self.assertEqual([[Game(name, "PC", GameStatus.beaten)] for name in names],
+                         [result.value for result in results])
+
+    def test_fetch_errors_are_reported(self):
+        def fetch(name):
+            if name == "bad":
+                raise ValueError("boom")
+            return gamebox.format(name)
+
+        results = list(fetch_and_parse(fetch, ["good", "bad"], parse_backloggery_page, parse_workers=1))
+        self.assertIsNone(results[0].error)
+        self.assertIsInstance(results[1].error, ValueError)
+
+    def test_parse_metrics_are_emitted_here(self):
+        recorder = metrics.subscribe(MetricsRecorder())
+        try:
+            list(fetch_and_parse(gamebox.format, ["Loom", "Zork"], parse_backloggery_page,
+                                 parse_workers=1))
+        finally:
+            metrics.unsubscribe(recorder)
+        self.assertEqual(2, recorder.get("parse_total", "backloggery.com"))
+        self.assertEqual(2, recorder.get("parse_rows_sum", "backloggery.com"))
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from ..backloggery import Backloggery, Game, GameStatus, SiteApi
+from ..replay import RecordingSession, ReplaySession, replay_throttle
+from ..throttle import HostThrottle, ThrottleSettings
+
+page = b"""
+<section class="gamebox">
+    <h2>
+        <a href="games.php?user=username&amp;console=3DS&amp;status=2">
+            <img alt="(B)" width="16" height="16" src="images/beaten.gif" />
+        </a>
+        <b>Art of Balance Touch</b>
+    </h2>
+    <div class="gamerow"><b>3DS</b></div>
+</section>
+"""
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "pages.db")
+        self.session = mock.MagicMock()
+        self.session.get.return_value = mock.MagicMock(status_code=200, ok=True, content=page)
+        self.session.post.return_value = mock.MagicMock(status_code=404, ok=False, content=b"gone")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_record_and_replay(self):
+        with RecordingSession(self.session, self.path) as recorder:
+            recorder.get("http://site/page", params={"ajid": 0})
+            recorder.post("http://site/search", data={"queryString": "Loom"})
+        replay = ReplaySession(self.path)
+        response = replay.get("http://site/page", params={"ajid": 0})
+        self.assertEqual((page, 200, True), (response.content, response.status_code, response.ok))
+        response = replay.post("http://site/search", data={"queryString": "Loom"})
+        self.assertEqual((b"gone", 404, False), (response.content, response.status_code, response.ok))
+        replay.close()
+
+    def test_unrecorded_request(self):
+        RecordingSession(self.session, self.path).close()
+        replay = ReplaySession(self.path)
+        self.assertRaises(requests.ConnectionError, replay.get, "http://site/page", params={"ajid": 50})
+        replay.close()
+
+    def test_recording_is_appended(self):
+        with RecordingSession(self.session, self.path) as recorder:
+            recorder.get("http://site/page", params={"ajid": 0})
+        with RecordingSession(self.session, self.path) as recorder:
+            recorder.get("http://site/page", params={"ajid": 0})
+            recorder.get("http://site/page", params={"ajid": 50})
+        replay = ReplaySession(self.path)
+        self.assertEqual(2, len(replay))
+        replay.close()
+
+    def test_retried_request_replays_last_attempt(self):
+        self.session.get.side_effect = [
+            mock.MagicMock(status_code=503, ok=False, content=b"busy"),
+            mock.MagicMock(status_code=200, ok=True, content=page),
+        ]
+        with RecordingSession(self.session, self.path) as recorder:
+            api = SiteApi("username", session=recorder,
+                          throttle=HostThrottle(ThrottleSettings(rate=1e9, burst=1e9, max_rate=1e9,
+                                                                 backoff_factor=0)))
+            self.assertEqual(page, api.get_page())
+        replay = ReplaySession(self.path)
+        api = SiteApi("username", session=replay, throttle=replay_throttle())
+        self.assertEqual(page, api.get_page())
+        replay.close()
+
+    def test_interrupted_recording_is_kept(self):
+        recorder = RecordingSession(self.session, self.path)
+        recorder.get("http://site/page", params={"ajid": 0})
+        replay = ReplaySession(self.path)
+        self.assertEqual(page, replay.get("http://site/page", params={"ajid": 0}).content)
+        replay.close()
+        recorder.close()
+
+    def test_replay_backloggery_find(self):
+        with RecordingSession(self.session, self.path) as recorder:
+            Backloggery("username", session=recorder, throttle=replay_throttle()).find()
+        replay = ReplaySession(self.path)
+        games = Backloggery("username", session=replay, throttle=replay_throttle()).find()
+        self.assertEqual([Game("Art of Balance Touch", "3DS", GameStatus.beaten)], games)
+        replay.close()
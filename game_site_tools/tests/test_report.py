@@ -0,0 +1,57 @@
+import threading
+import unittest
+from unittest import mock
+
+from ..backloggery import Game, GameStatus
+from ..howlongtobeat import LookupResult
+from ..report import BacklogReportBuilder
+
+
+class BacklogReportBuilderTest(unittest.TestCase):
+    def setUp(self):
+        backlog = {
+            GameStatus.unplayed: [Game("Loom", "PC", GameStatus.unplayed),
+                                  Game("Loom", "Amiga", GameStatus.unplayed),
+                                  Game("Age of Enigma", "PC", GameStatus.unplayed),
+                                  Game("A Mind Forever Voyaging", "PC", GameStatus.unplayed)],
+            GameStatus.unfinished: [Game("Zork", "PC", GameStatus.unfinished),
+                                    Game("Myst", "Mac", GameStatus.unfinished)],
+        }
+        hours = {"Loom": 4, "Zork": 10, "Age of Enigma": None, "A Mind Forever Voyaging": 0}
+        self.backloggery = mock.MagicMock()
+        self.backloggery.iter_games.side_effect = \
+            lambda params, workers: iter(backlog[params["status"]])
+        self.hltb = mock.MagicMock()
+        self.hltb.lookup.side_effect = lambda name: \
+            LookupResult(name, hours.get(name), None if name in hours else ValueError(name))
+        self.report = BacklogReportBuilder(self.backloggery, self.hltb).build()
+
+    def test_titles_are_looked_up_once(self):
+        self.assertEqual(["Loom", "Age of Enigma", "A Mind Forever Voyaging", "Zork", "Myst"],
+                         [args[0] for args, _ in self.hltb.lookup.call_args_list])
+
+    def test_lookups_start_while_streaming(self):
+        looked_up = threading.Event()
+        seen_during_stream = []
+
+        def iter_games(params, workers):
+            yield Game("Loom", "PC", GameStatus.unplayed)
+            seen_during_stream.append(looked_up.wait(5))
+
+        self.backloggery.iter_games.side_effect = iter_games
+        self.hltb.lookup.side_effect = lambda name: looked_up.set() or LookupResult(name, 4, None)
+        report = BacklogReportBuilder(self.backloggery, self.hltb,
+                                      statuses=[GameStatus.unplayed]).build()
+        self.assertEqual([True], seen_during_stream)
+        self.assertEqual(4, report.total_hours)
+
+    def test_totals(self):
+        self.assertEqual(18, self.report.total_hours)
+        self.assertEqual({"PC": 14, "Amiga": 4}, self.report.hours_by_platform)
+        self.assertEqual({GameStatus.unplayed: 8, GameStatus.unfinished: 10},
+                         self.report.hours_by_status)
+
+    def test_unmatched_and_errors(self):
+        self.assertEqual(["Age of Enigma"], self.report.unmatched)
+        self.assertEqual(["A Mind Forever Voyaging"], self.report.untimed)
+        self.assertEqual(["Myst"], list(self.report.errors))
@@ -0,0 +1,29 @@
+import unittest
+from unittest import mock
+
+from ..session import make_session, default_session
+
+
+class MakeSessionTest(unittest.TestCase):
+    def test_adapter_pool_and_retries(self):
+        session = make_session(pool_size=4, retries=2)
+        adapter = session.get_adapter("https://howlongtobeat.com")
+        self.assertEqual(4, adapter._pool_maxsize)
+        self.assertEqual(2, adapter.max_retries.total)
+        self.assertFalse(adapter.max_retries.status_forcelist)
+        self.assertFalse(adapter.max_retries.respect_retry_after_header)
+
+    @mock.patch("requests.Session.request")
+    def test_default_timeout(self, mock_request):
+        session = make_session(timeout=(1, 2))
+        session.request("GET", "http://backloggery.com")
+        mock_request.assert_called_with("GET", "http://backloggery.com", timeout=(1, 2))
+
+    @mock.patch("requests.Session.request")
+    def test_explicit_timeout_wins(self, mock_request):
+        session = make_session(timeout=(1, 2))
+        session.request("GET", "http://backloggery.com", timeout=10)
+        mock_request.assert_called_with("GET", "http://backloggery.com", timeout=10)
+
+    def test_default_session_is_shared(self):
+        self.assertIs(default_session(), default_session())
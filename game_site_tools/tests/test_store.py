@@ -0,0 +1,53 @@
+import unittest
+
+from ..backloggery import Game, GameStatus
+from ..howlongtobeat import HltbEntry
+from ..store import GameStore
+
+
+class GameStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = GameStore(":memory:")
+        self.store.add_games("alice", [Game("Okami", "PS2", GameStatus.unfinished),
+                                       Game("Shadow of the Colossus", "PS2", GameStatus.unplayed),
+                                       Game("Portal 2", "PC", GameStatus.unfinished)])
+        self.store.add_games("bob", [Game("Ōkami", "PS2", GameStatus.unfinished),
+                                     Game("Zork", "PC", GameStatus.beaten)])
+        self.store.add_entries([HltbEntry(1, "Okami", 33, 45.5, 60),
+                                HltbEntry(2, "Portal II", 8, 13, 21),
+                                HltbEntry(3, "Shadow of the Colossus", 8, 10, 14)])
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_total_hours_across_users(self):
+        self.assertEqual(66, self.store.total_hours(platform="PS2", status=GameStatus.unfinished))
+
+    def test_total_hours_for_user_and_column(self):
+        self.assertEqual(58.5, self.store.total_hours(user="alice", status=GameStatus.unfinished,
+                                                      column="main_extra"))
+
+    def test_multiple_values(self):
+        self.assertEqual(49, self.store.total_hours(
+            user="alice", status=[GameStatus.unfinished, GameStatus.unplayed]))
+
+    def test_unknown_column(self):
+        self.assertRaises(ValueError, self.store.total_hours, column="name")
+
+    def test_add_games_replaces_user(self):
+        self.store.add_games("bob", [Game("Loom", "PC", GameStatus.unplayed)])
+        self.assertEqual([Game("Loom", "PC", GameStatus.unplayed)], self.store.games(user="bob"))
+
+    def test_titles_without_times(self):
+        self.assertEqual(["Zork"], self.store.titles_without_times())
+        self.store.add_times({"Zork": 10})
+        self.assertEqual([], self.store.titles_without_times())
+        self.assertEqual(10, self.store.total_hours(user="bob", status=GameStatus.beaten))
+
+    def test_add_times_keeps_other_columns(self):
+        self.store.add_times({"Okami": 30})
+        self.assertEqual(30, self.store.total_hours(user="alice", platform="PS2",
+                                                    status=GameStatus.unfinished))
+        self.assertEqual(45.5, self.store.total_hours(user="alice", platform="PS2",
+                                                      status=GameStatus.unfinished,
+                                                      column="main_extra"))
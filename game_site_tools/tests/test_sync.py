@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from ..backloggery import Game, GameStatus
+from ..sync import BacklogSync, SnapshotStore, diff_games
+
+
+class DiffGamesTest(unittest.TestCase):
+    def test_no_changes(self):
+        games = [Game("Loom", "PC", GameStatus.beaten)]
+        self.assertEqual(([], [], []), diff_games(games, list(games)))
+
+    def test_added_and_removed(self):
+        old = [Game("Loom", "PC", GameStatus.beaten)]
+        new = [Game("Zork", "PC", GameStatus.unplayed)]
+        diff = diff_games(old, new)
+        self.assertEqual(new, diff.added)
+        self.assertEqual(old, diff.removed)
+        self.assertEqual([], diff.status_changed)
+
+    def test_status_changed(self):
+        old = [Game("Loom", "PC", GameStatus.unplayed), Game("Zork", "PC", GameStatus.beaten)]
+        new = [Game("Loom", "PC", GameStatus.beaten), Game("Zork", "PC", GameStatus.beaten)]
+        diff = diff_games(old, new)
+        self.assertEqual([], diff.added)
+        self.assertEqual([], diff.removed)
+        self.assertEqual([(old[0], new[0])], diff.status_changed)
+
+    def test_duplicate_copies(self):
+        old = [Game("Loom", "PC", GameStatus.beaten)]
+        new = [Game("Loom", "PC", GameStatus.beaten)] * 2
+        self.assertEqual([Game("Loom", "PC", GameStatus.beaten)], diff_games(old, new).added)
+
+
+class BacklogSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = SnapshotStore(self.directory)
+        self.backloggery = mock.MagicMock()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_first_sync_adds_everything(self):
+        games = [Game("Loom", "PC", GameStatus.beaten)]
+        self.backloggery.find.return_value = games
+        diff = BacklogSync("username", self.store, self.backloggery).sync()
+        self.assertEqual(games, diff.added)
+        self.assertEqual(games, self.store.load("username"))
+
+    def test_second_sync_reports_changes(self):
+        sync = BacklogSync("username", self.store, self.backloggery)
+        self.backloggery.find.return_value = [Game("Loom", "PC", GameStatus.unplayed)]
+        sync.sync()
+        self.backloggery.find.return_value = [Game("Loom", "PC", GameStatus.beaten)]
+        diff = sync.sync()
+        self.assertEqual([(Game("Loom", "PC", GameStatus.unplayed), Game("Loom", "PC", GameStatus.beaten))],
+                         diff.status_changed)
+
+    def test_unknown_user_has_no_snapshot(self):
+        self.assertIsNone(self.store.load("nobody"))
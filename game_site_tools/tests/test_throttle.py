@@ -0,0 +1,170 @@
+import unittest
+from unittest import mock
+
+import requests
+
+from ..errors import CircuitOpenError, SiteError
+from ..throttle import (RateLimiter, AdaptiveRateLimiter, CircuitBreaker, HostThrottle,
+                        ThrottleSettings, host_throttle)
+
+
+@mock.patch("time.sleep")
+class RateLimiterTest(unittest.TestCase):
+    def test_burst_does_not_wait(self, mock_sleep):
+        limiter = RateLimiter(rate=1, burst=3)
+        for _ in range(3):
+            limiter.wait()
+        mock_sleep.assert_not_called()
+
+    def test_waits_after_burst(self, mock_sleep):
+        with mock.patch("time.monotonic", return_value=100):
+            limiter = RateLimiter(rate=2, burst=1)
+            limiter.wait()
+            limiter.wait()
+            limiter.wait()
+        mock_sleep.assert_has_calls([mock.call(0.5), mock.call(1.0)])
+
+
+@mock.patch("time.sleep")
+class AdaptiveRateLimiterTest(unittest.TestCase):
+    def test_speeds_up_on_fast_responses(self, mock_sleep):
+        limiter = AdaptiveRateLimiter(rate=1, max_rate=1.15, increase=0.1)
+        limiter.on_success(0.1)
+        self.assertAlmostEqual(1.1, limiter.rate)
+        limiter.on_success(0.1)
+        self.assertAlmostEqual(1.15, limiter.rate)
+
+    def test_slows_down_on_slow_responses(self, mock_sleep):
+        limiter = AdaptiveRateLimiter(rate=1, slow_latency=2)
+        limiter.on_success(3)
+        self.assertAlmostEqual(0.9, limiter.rate)
+
+    def test_halves_when_throttled(self, mock_sleep):
+        limiter = AdaptiveRateLimiter(rate=4, min_rate=1)
+        limiter.on_throttled()
+        self.assertEqual(2, limiter.rate)
+        limiter.on_throttled()
+        limiter.on_throttled()
+        self.assertEqual(1, limiter.rate)
+
+    def test_retry_after_blocks_requests(self, mock_sleep):
+        with mock.patch("time.monotonic", return_value=100):
+            limiter = AdaptiveRateLimiter(rate=10, burst=10)
+            limiter.on_throttled(retry_after=30)
+            limiter.wait()
+        mock_sleep.assert_called_once_with(30)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.before_request()
+        breaker.record_failure()
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.before_request()
+
+    @mock.patch("time.monotonic")
+    def test_trial_request_after_timeout(self, mock_time):
+        mock_time.return_value = 100
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        mock_time.return_value = 131
+        breaker.before_request()
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+        breaker.record_failure()
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+        mock_time.return_value = 162
+        breaker.before_request()
+        breaker.record_success()
+        breaker.before_request()
+
+
+def response(status_code, headers={}):
+    return mock.MagicMock(status_code=status_code, ok=status_code < 400, headers=headers)
+
+
+@mock.patch("time.sleep")
+class HostThrottleTest(unittest.TestCase):
+    def setUp(self):
+        self.throttle = HostThrottle(ThrottleSettings(rate=4, failure_threshold=2, retries=0))
+
+    def test_returns_successful_response(self, mock_sleep):
+        ok = response(200)
+        self.assertIs(ok, self.throttle.send(lambda: ok))
+
+    def test_429_slows_down(self, mock_sleep):
+        with self.assertRaises(SiteError) as e:
+            self.throttle.send(lambda: response(429, {"Retry-After": "10"}))
+        self.assertEqual(429, e.exception.status)
+        self.assertEqual(2, self.throttle.limiter.rate)
+        self.assertGreater(self.throttle.limiter.blocked_until, 0)
+
+    def test_server_errors_open_circuit(self, mock_sleep):
+        for _ in range(2):
+            self.assertRaises(SiteError, self.throttle.send, lambda: response(503))
+        send = mock.MagicMock()
+        self.assertRaises(CircuitOpenError, self.throttle.send, send)
+        send.assert_not_called()
+
+    def test_connection_errors_open_circuit(self, mock_sleep):
+        def fail():
+            raise requests.ConnectionError("down")
+        for _ in range(2):
+            self.assertRaises(SiteError, self.throttle.send, fail)
+        self.assertRaises(CircuitOpenError, self.throttle.send, fail)
+
+    def test_client_errors_do_not_open_circuit(self, mock_sleep):
+        for _ in range(3):
+            self.assertRaises(SiteError, self.throttle.send, lambda: response(404))
+        self.throttle.breaker.before_request()
+
+
+@mock.patch("time.sleep")
+class HostThrottleRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.throttle = HostThrottle(ThrottleSettings(rate=4, failure_threshold=5, retries=2))
+
+    def test_server_errors_are_retried(self, mock_sleep):
+        ok = response(200)
+        send = mock.MagicMock(side_effect=[response(503), response(502), ok])
+        self.assertIs(ok, self.throttle.send(send))
+        self.assertEqual(0, self.throttle.breaker.failures)
+        mock_sleep.assert_has_calls([mock.call(0.5), mock.call(1.0)])
+
+    def test_gives_up_after_retries(self, mock_sleep):
+        send = mock.MagicMock(return_value=response(503))
+        with self.assertRaises(SiteError) as e:
+            self.throttle.send(send)
+        self.assertEqual(503, e.exception.status)
+        self.assertEqual(3, send.call_count)
+        self.assertEqual(3, self.throttle.breaker.failures)
+
+    def test_429_waits_for_retry_after(self, mock_sleep):
+        ok = response(200)
+        send = mock.MagicMock(side_effect=[response(429, {"Retry-After": "10"}), ok])
+        self.assertIs(ok, self.throttle.send(send))
+        self.assertAlmostEqual(10, mock_sleep.call_args[0][0], delta=1)
+
+    def test_429_with_long_retry_after_is_not_retried(self, mock_sleep):
+        send = mock.MagicMock(return_value=response(429, {"Retry-After": "3600"}))
+        self.assertRaises(SiteError, self.throttle.send, send)
+        self.assertEqual(1, send.call_count)
+
+    def test_client_errors_are_not_retried(self, mock_sleep):
+        send = mock.MagicMock(return_value=response(404))
+        self.assertRaises(SiteError, self.throttle.send, send)
+        self.assertEqual(1, send.call_count)
+
+
+class HostThrottleRegistryTest(unittest.TestCase):
+    def test_same_throttle_per_host(self):
+        throttle = host_throttle("example.com")
+        self.assertIs(throttle, host_throttle("example.com"))
+        self.assertIsNot(throttle, host_throttle("example.org"))
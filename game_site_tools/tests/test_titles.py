@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+
+from ..howlongtobeat import HltbEntry
+from ..titles import (normalize, TitleIndex, to_roman, from_roman,
+                      arabic_to_roman, roman_to_arabic, number_variants, query_variants,
+                      strip_editions)
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_roman_numerals(self):
+        self.assertEqual(normalize("Gabriel Knight 2"), normalize("Gabriel Knight II"))
+
+    def test_punctuation_and_subtitle_separator(self):
+        self.assertEqual(normalize("Zelda: Ocarina of Time"), normalize("Zelda - Ocarina of Time"))
+
+    def test_numerals_only_in_series_position(self):
+        self.assertNotEqual(normalize("Mega Man X"), normalize("Mega Man 10"))
+        self.assertEqual("x men legends", normalize("X-Men Legends"))
+        self.assertEqual("civilization 4 colonization", normalize("Civilization IV: Colonization"))
+
+    def test_the_prefix(self):
+        self.assertEqual("legend of zelda", normalize("The Legend of Zelda"))
+
+    def test_accents_and_apostrophes(self):
+        self.assertEqual("pokemon", normalize("Pokémon"))
+        self.assertEqual("baldurs gate", normalize("Baldur's Gate"))
+
+
+class NumberVariantsTest(unittest.TestCase):
+    def test_roman_numerals(self):
+        self.assertEqual("XIV", to_roman(14))
+        self.assertEqual(14, from_roman("XIV"))
+        self.assertIsNone(from_roman("I"))
+        self.assertIsNone(from_roman("MIX"))
+
+    def test_numbers_above_ten(self):
+        self.assertEqual("Final Fantasy XIII", arabic_to_roman("Final Fantasy 13"))
+        self.assertEqual("Final Fantasy 13", roman_to_arabic("Final Fantasy XIII"))
+
+    def test_variants_in_both_directions(self):
+        self.assertEqual(("Kings Quest II",), number_variants("Kings Quest 2"))
+        self.assertEqual(("Kings Quest 2",), number_variants("Kings Quest II"))
+
+    def test_large_numbers_are_part_of_the_name(self):
+        self.assertEqual((), number_variants("1701 A.D"))
+        self.assertEqual((), number_variants("I Am Setsuna"))
+
+    def test_results_are_memoized(self):
+        number_variants.cache_clear()
+        number_variants("Gabriel Knight 2")
+        number_variants("Gabriel Knight 2")
+        self.assertEqual(1, number_variants.cache_info().hits)
+
+
+class QueryVariantsTest(unittest.TestCase):
+    def test_platform_tags(self):
+        self.assertEqual(("Final Fantasy VII", "Final Fantasy 7"),
+                         query_variants("Final Fantasy VII (PSN)"))
+
+    def test_edition_suffixes(self):
+        self.assertEqual("Bioshock", strip_editions("Bioshock Remastered"))
+        self.assertEqual("Fallout 3", strip_editions("Fallout 3: Game of the Year Edition"))
+        self.assertEqual("Halo", strip_editions("Halo HD Remastered"))
+        self.assertEqual("Deluxe Paint", strip_editions("Deluxe Paint"))
+
+    def test_subtitle_is_dropped_last(self):
+        self.assertEqual(("Gabriel Knight 2: The Beast Within", "Gabriel Knight II", "Gabriel Knight 2"),
+                         query_variants("Gabriel Knight II: The Beast Within"))
+
+    def test_no_variants(self):
+        self.assertEqual((), query_variants("Age of Enigma"))
+        self.assertEqual((), query_variants("X-Men Legends"))
+        self.assertEqual((), query_variants("Mega Man X"))
+        self.assertEqual((), query_variants("Left 4 Dead"))
+
+
+class TitleIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TitleIndex()
+        self.index.add_entries([
+            HltbEntry(3782, "Gabriel Knight II: The Beast Within", 14, 15, None),
+            HltbEntry(7231, "Portal", 3, 4, 5),
+            HltbEntry(7232, "Portal 2", 8, 13, 21),
+        ])
+
+    def test_exact_match(self):
+        self.assertEqual(7232, self.index.lookup("Portal II").id)
+
+    def test_fuzzy_match(self):
+        self.assertEqual(3782, self.index.lookup("Gabriel Knight 2 - The Beast Within!").id)
+        self.assertEqual(3782, self.index.lookup("Gabriel Knight 2: Beast Within").id)
+
+    def test_numbers_must_match(self):
+        self.assertIsNone(self.index.lookup("Portal 3"))
+
+    def test_lone_numeral_is_part_of_the_name(self):
+        self.index.add(HltbEntry(4521, "Mega Man 10", 3, 5, 9))
+        self.assertIsNone(self.index.lookup("Mega Man X"))
+
+    def test_no_match(self):
+        self.assertIsNone(self.index.lookup("Age of Enigma"))
+
+    def test_save_and_load(self):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            self.index.save(path)
+            index = TitleIndex()
+            index.load(path)
+            self.assertEqual(3, len(index))
+            self.assertEqual(HltbEntry(7231, "Portal", 3, 4, 5), index.lookup("Portal"))
+        finally:
+            os.remove(path)
@@ -0,0 +1,246 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from .errors import CircuitOpenError, SiteError
+from .metrics import metrics
+
+
+def _retry_after(response):
+    """
+    Returns the Retry-After header of a response in seconds
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Token bucket limiting requests to a host
+
+    Allows a burst of `burst` requests, after which callers are held back to
+    `rate` requests per second. Safe to share between threads.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _delay(self, now):
+        return -self.tokens / self.rate if self.tokens < 0 else 0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            delay = self._delay(now)
+        if delay:
+            time.sleep(delay)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    Token bucket whose rate follows the responses from the host
+
+    The rate creeps up by `increase` on each fast response, up to `max_rate`.
+    It is cut by 10% when responses take longer than `slow_latency` seconds
+    and halved when the host says it is throttling us, down to `min_rate`.
+    A Retry-After from the host holds back every request until it has passed.
+    """
+    def __init__(self, rate, burst=1, min_rate=0.5, max_rate=10, increase=0.1, slow_latency=5):
+        super().__init__(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.slow_latency = slow_latency
+        self.blocked_until = 0
+
+    def _delay(self, now):
+        return max(super()._delay(now), self.blocked_until - now)
+
+    def _set_rate(self, rate):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, max(self.min_rate, rate))
+
+    def on_success(self, latency):
+        if latency > self.slow_latency:
+            self._set_rate(self.rate * 0.9)
+        else:
+            self._set_rate(self.rate + self.increase)
+
+    def on_throttled(self, retry_after=None):
+        self._set_rate(self.rate / 2)
+        if retry_after:
+            with self.lock:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+
+class CircuitBreaker:
+    """
+    Stops requests to a host that keeps failing
+
+    After `failure_threshold` failures in a row the circuit opens and
+    requests fail immediately with CircuitOpenError. Once `reset_timeout`
+    seconds have passed, one trial request is let through. The circuit closes
+    again if it succeeds, and stays open for another `reset_timeout` if not.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if self.trial_running or time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("Too many recent failures, not sending request")
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class ThrottleSettings:
+    """
+    Settings for the rate limiter and circuit breaker of each host
+    """
+    def __init__(self, rate=4, burst=8, min_rate=0.5, max_rate=10, slow_latency=5,
+                 failure_threshold=5, reset_timeout=30, retries=3, backoff_factor=0.5,
+                 max_retry_after=120):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.slow_latency = slow_latency
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_retry_after = max_retry_after
+
+
+default_settings = ThrottleSettings()
+
+
+class HostThrottle:
+    def __init__(self, settings=default_settings, host=None):
+        self.host = host
+        self.limiter = AdaptiveRateLimiter(settings.rate, settings.burst,
+                                           min_rate=settings.min_rate,
+                                           max_rate=settings.max_rate,
+                                           slow_latency=settings.slow_latency)
+        self.breaker = CircuitBreaker(settings.failure_threshold, settings.reset_timeout)
+        self.retries = settings.retries
+        self.backoff_factor = settings.backoff_factor
+        self.max_retry_after = settings.max_retry_after
+
+    def send(self, send_request):
+        """
+        Calls send_request() through the circuit breaker and rate limiter
+
+        Returns the response if it was successful, otherwise raises SiteError.
+        Connection errors and 5xx responses count as failures for the circuit
+        breaker, and 429 responses slow down the rate limiter.
+
+        429 and 5xx responses are retried up to `retries` times. The session
+        only retries connection errors, so every response is seen here. A 5xx
+        is retried with exponential backoff, and a 429 once the rate limiter
+        lets it through, which honours Retry-After up to `max_retry_after`.
+        """
+        attempt = 0
+        while True:
+            response = self._send_once(send_request, attempt)
+            if response.ok:
+                return response
+            if response.status_code == 429:
+                error = SiteError("Too many requests", 429)
+                retry = (_retry_after(response) or 0) <= self.max_retry_after
+            else:
+                error = SiteError("HTTP error {}".format(response.status_code), response.status_code)
+                retry = response.status_code >= 500
+            if not retry or attempt >= self.retries:
+                raise error
+            if response.status_code != 429:
+                time.sleep(self.backoff_factor * 2 ** attempt)
+            attempt += 1
+
+    def _send_once(self, send_request, attempt):
+        """
+        Sends one request and updates the circuit breaker and rate limiter
+        """
+        self.breaker.before_request()
+        self.limiter.wait()
+        start = time.monotonic()
+        try:
+            response = send_request()
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            metrics.emit("request", site=self.host, latency=time.monotonic() - start,
+                         bytes=0, status=None, retries=attempt)
+            raise SiteError(str(e)) from e
+        latency = time.monotonic() - start
+        if metrics.listeners:
+            retries = getattr(getattr(response.raw, "retries", None), "history", ())
+            metrics.emit("request", site=self.host, latency=latency,
+                         bytes=len(response.content), status=response.status_code,
+                         retries=attempt + len(retries))
+        if response.status_code == 429:
+            self.breaker.record_success()
+            self.limiter.on_throttled(_retry_after(response))
+        elif response.ok:
+            self.breaker.record_success()
+            self.limiter.on_success(latency)
+        elif response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+
+_host_throttles = {}
+_host_throttles_lock = threading.Lock()
+
+
+def host_throttle(host, settings=default_settings):
+    """
+    Returns the throttle shared by everything talking to `host`
+
+    The settings are only used the first time a host is seen
+    """
+    with _host_throttles_lock:
+        if host not in _host_throttles:
+            _host_throttles[host] = HostThrottle(settings, host)
+        return _host_throttles[host]
@@ -0,0 +1,264 @@
+import json
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+# Bigger numbers are generally part of the name, eg: 1701 A.D, rather than
+# the position in a series
+MAX_SERIES_NUMBER = 39
+
+# A number is only the position in a series at the end of the name, or
+# before a subtitle or tag, so X-Men and Mega Man X Legacy Collection are
+# left alone
+SERIES_POSITION = r"(?=\s*(?:$|[:(\[]|[-\u2013]\s))"
+
+NUMBER_PATTERN = re.compile(r"\d+")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+SERIES_NUMBER_PATTERN = re.compile(r"\b\d+" + SERIES_POSITION)
+ROMAN_WORD_PATTERN = re.compile(r"\b[IVXLCDM]+\b" + SERIES_POSITION)
+TAG_PATTERN = re.compile(r"\s*[(\[][^)\]]*[)\]]")
+EDITION_PATTERN = re.compile(
+    r"(?:\s*[:\-\u2013]\s*|\s+)(?:GOTY|Game of the Year|Remastered|Remaster|Definitive|Deluxe|"
+    r"Complete|Special|Enhanced|Anniversary|HD|Director'?s Cut)(?:\s+Edition)?\s*$",
+    re.IGNORECASE)
+SUBTITLE_PATTERN = re.compile(r"\s*(?::|\s-\s|\s\u2013\s).*$")
+
+ROMAN_VALUES = [
+    (1000, "M"), (900, "CM"), (500, "D"), (400, "CD"), (100, "C"), (90, "XC"),
+    (50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I"),
+]
+
+
+def to_roman(number):
+    roman = ""
+    for value, numeral in ROMAN_VALUES:
+        count, number = divmod(number, value)
+        roman += numeral * count
+    return roman
+
+
+_ROMAN_NUMBERS = {to_roman(number): number for number in range(1, MAX_SERIES_NUMBER + 1)}
+
+
+def from_roman(word):
+    """
+    Returns the number for a roman numeral up to MAX_SERIES_NUMBER, or None
+
+    The single letter "I" is not treated as a numeral as it is usually a
+    word, eg: I Am Setsuna
+    """
+    if word == "I":
+        return None
+    return _ROMAN_NUMBERS.get(word)
+
+
+def _number_to_roman(match):
+    number = int(match.group())
+    return to_roman(number) if 0 < number <= MAX_SERIES_NUMBER else match.group()
+
+
+def _roman_to_number(match):
+    # A single letter is too often part of the name, eg: Mega Man X is not
+    # Mega Man 10
+    number = from_roman(match.group()) if len(match.group()) > 1 else None
+    return str(number) if number is not None else match.group()
+
+
+@lru_cache(maxsize=1 << 17)
+def arabic_to_roman(name):
+    """
+    Kings Quest 2 -> Kings Quest II
+    """
+    return SERIES_NUMBER_PATTERN.sub(_number_to_roman, name)
+
+
+@lru_cache(maxsize=1 << 17)
+def roman_to_arabic(name):
+    """
+    Kings Quest II -> Kings Quest 2
+    """
+    return ROMAN_WORD_PATTERN.sub(_roman_to_number, name)
+
+
+@lru_cache(maxsize=1 << 17)
+def number_variants(name):
+    """
+    Returns the other ways of writing the series numbers in a name
+
+    Games in a series sometimes have the number stored in roman and
+    sometimes in arabic numerals, eg: Kings Quest 2 and Kings Quest II
+    """
+    variants = []
+    for variant in (arabic_to_roman(name), roman_to_arabic(name)):
+        if variant != name and variant not in variants:
+            variants.append(variant)
+    return tuple(variants)
+
+
+def strip_tags(name):
+    """
+    Final Fantasy VII (PSN) -> Final Fantasy VII
+    """
+    return TAG_PATTERN.sub("", name).strip()
+
+
+def strip_editions(name):
+    """
+    Bioshock Remastered -> Bioshock, Fallout 3: Game of the Year Edition -> Fallout 3
+    """
+    stripped = EDITION_PATTERN.sub("", name)
+    while stripped != name:
+        name = stripped
+        stripped = EDITION_PATTERN.sub("", name)
+    return name
+
+
+def strip_subtitle(name):
+    """
+    Gabriel Knight II: The Beast Within -> Gabriel Knight II
+    """
+    return SUBTITLE_PATTERN.sub("", name)
+
+
+@lru_cache(maxsize=1 << 17)
+def query_variants(name):
+    """
+    Returns other names to search for when a name has no hits, best first
+
+    Platform tags are dropped first, then edition suffixes, then the
+    subtitle. Each of these is followed by its roman/arabic number variants.
+    """
+    untagged = strip_tags(name)
+    without_edition = strip_editions(untagged)
+    candidates = [untagged, without_edition, strip_subtitle(without_edition)]
+    variants = []
+    for candidate in candidates:
+        for variant in (candidate,) + number_variants(candidate):
+            if variant and variant != name and variant not in variants:
+                variants.append(variant)
+    return tuple(variants)
+
+
+@lru_cache(maxsize=1 << 17)
+def normalize(title):
+    """
+    Reduces a title to a canonical form for matching
+
+    Accents, case, punctuation and a leading "The" are dropped and roman
+    numerals in series position become numbers, so "The Legend of Zelda:
+    Ocarina of Time" and "legend of zelda - ocarina of time" are the same, as
+    are "Gabriel Knight II" and "Gabriel Knight 2". Subtitle separators are
+    just punctuation, so a title with a subtitle matches the same title with
+    a different separator.
+    """
+    title = roman_to_arabic(title)
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(c for c in title if not unicodedata.combining(c))
+    title = title.lower().replace("&", " and ").replace("'", "")
+    words = WORD_PATTERN.findall(title)
+    if words and words[0] == "the":
+        words = words[1:]
+    return " ".join(words)
+
+
+def _trigrams(normalized):
+    padded = "  " + normalized + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _numbers(normalized):
+    return set(NUMBER_PATTERN.findall(normalized))
+
+
+class TitleIndex:
+    """
+    Local index of HowLongToBeat entries for matching titles without a request
+
+    Titles are matched exactly after normalization, then by trigram
+    similarity. A fuzzy match must have the same numbers as the query, so
+    that "Portal" never matches "Portal 2".
+    """
+    def __init__(self, threshold=0.8):
+        self.threshold = threshold
+        self.entries = {}
+        self.key_trigrams = {}
+        self.key_numbers = {}
+        self.trigram_index = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry):
+        key = normalize(entry.title)
+        trigrams = frozenset(_trigrams(key))
+        with self.lock:
+            self.entries[key] = entry
+            if key not in self.key_trigrams:
+                self.key_trigrams[key] = trigrams
+                self.key_numbers[key] = _numbers(key)
+                for trigram in trigrams:
+                    self.trigram_index[trigram].add(key)
+
+    def add_entries(self, entries):
+        for entry in entries:
+            self.add(entry)
+
+    def _candidates(self, trigrams, min_overlap):
+        """
+        Returns the keys that could share `min_overlap` trigrams with the query
+
+        Such a key shares at least one of any len(trigrams) - min_overlap + 1
+        of the query's trigrams, so only the rarest ones are looked up
+        """
+        ranked = sorted(trigrams, key=lambda trigram: len(self.trigram_index.get(trigram, ())))
+        candidates = set()
+        for trigram in ranked[:max(1, len(trigrams) - min_overlap + 1)]:
+            candidates.update(self.trigram_index.get(trigram, ()))
+        return candidates
+
+    def lookup(self, title):
+        """
+        Returns the best matching entry, or None if nothing is close enough
+        """
+        query = normalize(title)
+        trigrams = _trigrams(query)
+        numbers = _numbers(query)
+        # The similarity is 2 * shared / (len(trigrams) + len(key trigrams)),
+        # which bounds the size of a matching key and how much it must share
+        min_size = self.threshold / (2 - self.threshold) * len(trigrams)
+        max_size = (2 - self.threshold) / self.threshold * len(trigrams)
+        min_overlap = math.ceil(self.threshold * (len(trigrams) + min_size) / 2 - 1e-9)
+        with self.lock:
+            if query in self.entries:
+                return self.entries[query]
+            candidates = self._candidates(trigrams, min_overlap)
+        best_score, best_key = 0, None
+        for key in candidates:
+            key_trigrams = self.key_trigrams[key]
+            if not min_size <= len(key_trigrams) <= max_size or self.key_numbers[key] != numbers:
+                continue
+            score = 2 * len(trigrams & key_trigrams) / (len(trigrams) + len(key_trigrams))
+            if score > best_score:
+                best_score, best_key = score, key
+        if best_key is not None and best_score >= self.threshold:
+            return self.entries[best_key]
+        return None
+
+    def save(self, path):
+        with self.lock:
+            rows = [list(entry) for entry in self.entries.values()]
+        with open(path, "w") as f:
+            json.dump(rows, f)
+
+    def load(self, path):
+        """
+        Adds the entries from a json dump, as written by save
+        """
+        # Imported here as howlongtobeat uses this module to build queries
+        from .howlongtobeat import HltbEntry
+        with open(path) as f:
+            self.add_entries(HltbEntry(*row) for row in json.load(f))